@@ -1,10 +1,29 @@
 import random
 import math
-import connect_four as c4
-from node import Node
+import time
+import multiprocessing
+from bitboard import WIDTH, is_mirrored
+from instrument import trace_sink
+from node import PROVEN_WIN, PROVEN_LOSS
+from opening_book import book_move
+from rollout_policy import get_policy
+from solver import Solver, best_scored_move, empty_cells, score_result
 from tree import Tree
 
 
+# selection variations understood by uct_move
+UCT_VARIATIONS = ('None', 'Exploitation', 'Exploration', 'Heuristic', 'RAVE')
+# expansion modes of run_simulations
+EXPANSIONS = ('single', 'all')
+# how results (-1, 0, 1) are printed
+RESULT_NAMES = {-1: 'Red wins', 0: 'draw', 1: 'Yellow wins'}
+# early stopping rules of run_simulations
+EARLY_STOP_RULES = ('margin', 'confidence')
+EARLY_STOP_INTERVAL = 4  # passes between two checks of the root statistics
+# width, in standard deviations, of the win rate intervals compared by the 'confidence' rule
+CONFIDENCE_Z = 2.58
+
+
 def uniform_random_move(game, print_out=False):
     """Baseline algorithm that randomly selects from available moves."""
     num_cols = len(game.board[0])  # Get the number of columns from the board
@@ -17,39 +36,220 @@ def uniform_random_move(game, print_out=False):
     return move
 
 
-def pmcgs_move(game, num_simulations, print_out='None'):
+def run_simulations(tree, num_simulations, algorithm_type='PMCGS', variation='None', print_out='None',
+                    rollouts_per_leaf=1, time_limit_ms=None, max_nodes=None, profiler=None, expansion='all',
+                    rollout_policy='random', stop=None, early_stop=None):
     """
-    Pure Monte Carlo Game Search (PMCGS) function to select the best move in a Connect Four game.
+    Run the select/expand/simulate/backpropagate loop on a tree.
 
     Parameters:
-    - game: ConnectFour object representing the current state of the game.
-    - num_simulations: Total number of simulations to perform.
+    - tree: Tree to grow; its scratch state is used for every phase.
+    - num_simulations: Number of selection passes to perform; None for no limit (a time or node budget is then required).
+    - algorithm_type: 'PMCGS' or 'UCT', controls how children are selected.
+    - variation: UCT variation passed on to the selection phase.
+    - rollouts_per_leaf: Number of random playouts per simulated node; more than one uses the NumPy batch simulator.
+    - time_limit_ms: Stop once this many milliseconds have passed.
+    - max_nodes: Stop once the tree holds this many nodes.
+    - profiler: Optional instrument.Profiler that times each phase and counts the work done.
+    - expansion: 'all' (default) adds every child of the selected node at once and simulates each
+      of them; 'single' adds and simulates one untried child per pass, so every pass is one playout.
+    - rollout_policy: name in rollout_policy.ROLLOUT_POLICIES ('random' or 'threat') or a function
+      choosing rollout moves. Batched rollouts are always uniformly random.
+    - stop: Optional event (threading.Event or multiprocessing.Event); the search stops once it is set.
+    - early_stop: Optional rule in EARLY_STOP_RULES; the search stops once the best root move is
+      settled by it (see root_settled), or after one pass if the root has a single legal move.
+
+    The search stops at whichever budget runs out first, but always completes at least one pass
+    unless the root is already proven; with the MCTS-Solver it also stops once the root is proven.
+    A tree with a memory budget (see Tree) is pruned or stops growing when it reaches it, and the
+    search goes on.
 
     Returns:
-    - The best move determined by the PMCGS process.
+    - The number of selection passes completed.
     """
-    # Step 1: Initialize the Tree with the root state
-    tree = Tree(game)
-    if (print_out=='Verbose' or print_out=='Brief'):
-        print(f'root player is: {tree.root.player}')
-
-    for _ in range(num_simulations):
-        # Step 2: Selection phase - Select a node to expand
-        selected_node = tree.select(algorithm_type='PMCGS', print_out=print_out)
+    if num_simulations is None and time_limit_ms is None and max_nodes is None:
+        raise ValueError("A search needs a simulation, time or node budget.")
+    if expansion not in EXPANSIONS:
+        raise ValueError(f"Unknown expansion mode: {expansion}")
+    policy = get_policy(rollout_policy)
+    if early_stop is not None and early_stop not in EARLY_STOP_RULES:
+        raise ValueError(f"Unknown early stopping rule: {early_stop}")
+    if rollouts_per_leaf > 1 and rollout_policy != 'random':
+        raise ValueError("Batched rollouts only support the random rollout policy.")
+    if rollout_policy == 'random':
+        policy = None  # simulate_from_node's own loop is the fastest way to play random moves
+    # RAVE needs the moves of every rollout for its all-moves-as-first statistics
+    rave = algorithm_type == 'UCT' and variation == 'RAVE'
+    if rollouts_per_leaf > 1 and rave:
+        raise ValueError("Batched rollouts do not support the RAVE variation.")
+
+    state = tree.state
+    started = time.perf_counter()
+    deadline = started + time_limit_ms / 1000 if time_limit_ms is not None else None
+
+    # the phases are looked up once; without a profiler or 'Verbose' output there is no sink and
+    # nothing is traced or timed
+    sink = trace_sink(print_out, profiler)
+    select = tree.select
+    backpropagate = tree.backpropagate
+
+    if rollouts_per_leaf > 1:
+        # imported here so NumPy is only needed when batched rollouts are requested
+        import numpy as np
+        from batch_rollout import simulate_batch
+
+        rng = np.random.default_rng(random.getrandbits(64))  # follows the seed of the random module
+        backpropagate = tree.backpropagate_counts
+
+        def rollout(node):
+            return simulate_batch(state, rollouts_per_leaf, rng)
+    elif rave:
+        tree.store.track_amaf()  # only RAVE searches pay for the AMAF arrays
+        update_amaf = tree.update_amaf
+
+        def rollout(node):
+            moves = []
+            result = node.simulate_from_node(state, sink=sink, policy=policy, moves=moves)
+            update_amaf(node, moves, result)  # the scratch state is still at the node
+            return result
+    else:
+        def rollout(node):
+            return node.simulate_from_node(state, sink=sink, policy=policy)
+
+    def expand(node):
+        node.expand_node(state, table=tree.table, sink=sink, symmetry=tree.symmetry)
+
+    def expand_one(node):
+        return node.expand_one(state, table=tree.table, sink=sink, symmetry=tree.symmetry)
+
+    if profiler is not None:
+        select = profiler.timed('select', select)
+        expand = profiler.timed('expand', expand)
+        expand_one = profiler.timed('expand', expand_one)
+        rollout = profiler.timed('rollout', rollout)
+        backpropagate = profiler.timed('backprop', backpropagate)
+
+    def simulate(node):
+        backpropagate(node, rollout(node), sink=sink)
+
+    bounded = tree.bounded
+
+    iterations = 0
+    while num_simulations is None or iterations < num_simulations:
+        # one clock read per pass; a pass runs at least one full rollout, which costs far more
+        if iterations and deadline is not None and time.perf_counter() >= deadline:
+            break
+        if iterations and max_nodes is not None and len(tree.store) >= max_nodes:
+            break
+        if iterations and stop is not None and stop.is_set():
+            break
+        if (early_stop is not None and (iterations == 1 or iterations and iterations % EARLY_STOP_INTERVAL == 0)
+                and root_settled(tree, early_stop, num_simulations - iterations if num_simulations else None)):
+            break
+        if tree.store.proven[tree.root_index]:
+            break  # solved; more simulations cannot change the answer
+        iterations += 1
+        # a tree at its memory budget is pruned here, between passes, when it has to be
+        expanding = not bounded or tree.has_room()
+
+        # Step 2: Selection phase - Select a node to expand; the scratch state follows the selected path
+        selected_node = select(algorithm_type=algorithm_type, variation=variation, sink=sink)
 
         # If we reach a terminal node, backpropagate the result and continue
         if selected_node.is_terminal:
-            result = selected_node.simulate_from_node(print_out=print_out)  # Simulate directly from terminal state
-            tree.backpropagate(selected_node, result, print_out=print_out)
+            simulate(selected_node)  # Simulate directly from terminal state
+            continue
+
+        # A node proven by the MCTS-Solver needs no rollout: its result is known
+        if selected_node.proven:
+            tree.backpropagate(selected_node, selected_node.proven_result, sink=sink)
+            continue
+
+        # A tree at its memory budget that cannot be pruned only refines the nodes it has
+        if not expanding:
+            simulate(selected_node)
+            continue
+
+        if expansion == 'single':
+            # Step 3: Expansion phase - Add one untried move of the selected node, then simulate from it
+            expanded = expand_one(selected_node)
+            if expanded is None:  # every move has a child already; simulate from the node itself
+                simulate(selected_node)
+                continue
+            move, child = expanded
+            state.make_move(move)
+            simulate(child)
+            state.undo_move()
             continue
 
         # Step 3: Expansion phase - Expand all legal moves from the selected node
-        selected_node.expand_node(print_out=print_out)  # Expands all possible child nodes for the selected node
+        expand(selected_node)  # Expands all possible child nodes for the selected node
 
         # Step 4: Simulation phase - Simulate for each child node and backpropagate results
-        for child in selected_node.children:
-            result = child.simulate_from_node(print_out=print_out)  # Simulate a random playthrough from this child node
-            tree.backpropagate(child, result, print_out=print_out)  # Backpropagate the result from this child
+        mirrored = tree.symmetry and is_mirrored(state.key())
+        for move, child in zip(selected_node.child_moves, selected_node.children):
+            if mirrored:
+                move = WIDTH - 1 - move  # the node keeps the columns of the position's mirror image
+            state.make_move(move)  # Step into the child's position
+            simulate(child)  # Simulate random playthroughs from this child node and backpropagate them
+            state.undo_move()  # Step back to the selected node
+
+    if profiler is not None:
+        profiler.iterations += iterations
+        profiler.elapsed_ms += (time.perf_counter() - started) * 1000
+
+    return iterations
+
+
+def pmcgs_move(game, num_simulations, print_out='None', rollouts_per_leaf=1, transpositions=False, seed=None,
+               time_limit_ms=None, max_nodes=None, stats=None, profiler=None, book=None, expansion='all',
+               rollout_policy='random'):
+    """
+    Pure Monte Carlo Game Search (PMCGS) function to select the best move in a Connect Four game.
+
+    Parameters:
+    - game: ConnectFour object representing the current state of the game.
+    - num_simulations: Total number of simulations to perform.
+    - rollouts_per_leaf: Number of random playouts run from each new node.
+    - transpositions: Share statistics between move orders that reach the same position.
+    - seed: Optional random seed, for reproducible searches.
+    - time_limit_ms: Optional time budget; with num_simulations of 0 the search runs until it expires.
+    - max_nodes: Optional limit on the number of tree nodes.
+    - stats: Optional dictionary that receives the budget, the number of iterations completed and the
+      win rate and visits of every root move.
+    - profiler: Optional instrument.Profiler that collects per-phase timings and counters.
+    - book: Optional opening book (an opening_book.OpeningBook or the path of one); positions found in it
+      are answered without searching.
+    - expansion: 'all' (default) to add every child of the selected node and simulate each of
+      them, 'single' to add and simulate one new node per simulation (the CLIs' default).
+    - rollout_policy: 'random', 'threat' (take wins, block losses, prefer the centre) or a function
+      choosing rollout moves.
+
+    Returns:
+    - The best move determined by the PMCGS process.
+    """
+    if seed is not None:
+        random.seed(seed)
+    if not num_simulations and (time_limit_ms is not None or max_nodes is not None):
+        num_simulations = None  # only the time/node budget applies
+    started = time.perf_counter()
+
+    if book is not None:
+        move = book_move(game, book, print_out)
+        if move is not None:
+            report_search(stats, 'None', started, 0, num_simulations, time_limit_ms, max_nodes)
+            return move
+
+    # Step 1: Initialize the Tree with the root state
+    tree = Tree(game, transpositions=transpositions)
+    if (print_out=='Verbose' or print_out=='Brief'):
+        print(f'root player is: {tree.root.player}')
+
+    iterations = run_simulations(tree, num_simulations, algorithm_type='PMCGS', print_out=print_out,
+                                 rollouts_per_leaf=rollouts_per_leaf, time_limit_ms=time_limit_ms, max_nodes=max_nodes,
+                                 profiler=profiler, expansion=expansion, rollout_policy=rollout_policy)
+    report_search(stats, print_out, started, iterations, num_simulations, time_limit_ms, max_nodes)
+    report_columns(stats, root_statistics(tree))
 
     # print the win rates of different moves
     for child in tree.root.children:
@@ -70,58 +270,334 @@ def pmcgs_move(game, num_simulations, print_out='None'):
         return best_node.move
 
 
-def uct_move(game, num_simulations, variation='None', print_out='None'):
+def root_statistics(tree):
+    """Map each move at the root of a tree to the (wins, visits) of the child it leads to."""
+    root = tree.root
+    return {move: (child.wins, child.visits) for move, child in zip(tree.root_moves(), root.children)}
+
+
+def root_proofs(tree):
+    """Map each root move proven by the MCTS-Solver to its value for the player to move (node.PROVEN_*)."""
+    root = tree.root
+    return {move: child.proven for move, child in zip(tree.root_moves(), root.children) if child.proven}
+
+
+def root_settled(tree, rule, remaining=None):
     """
-    UCT function to select the best move in a Connect Four game.
+    Whether more simulations are not expected to change the best root move of a tree.
+
+    A root with a single legal move is always settled. Otherwise every legal move must have a
+    child, and the move best_root_move would pick must be ahead of every other move that is not
+    proven to lose:
+    - 'margin': by so much that no other move could overtake its win rate even if it won every
+      remaining simulation while the best move lost every one of them (never settled without a
+      simulation budget). Only a proof found by the MCTS-Solver can then change the choice;
+    - 'confidence': with a win rate interval of CONFIDENCE_Z standard deviations that does not
+      overlap the interval of any other move.
+    """
+    store = tree.store
+    root = tree.root_index
+    if store.child_count[root] < store.move_count[root]:
+        return False  # an untried move could still turn out best
+    if store.move_count[root] == 1:
+        return True
+    if rule == 'margin' and remaining is None:
+        return False
+
+    statistics = root_statistics(tree)
+    proofs = root_proofs(tree)
+    best = best_root_move(statistics, proofs)
+    best_wins, best_visits = statistics[best]
+    # intervals use the largest standard deviation of a win rate, that of a rate of one half
+    best_low = best_wins / best_visits - CONFIDENCE_Z * 0.5 / math.sqrt(best_visits)
+    for move, (wins, visits) in statistics.items():
+        if move == best or proofs.get(move) == PROVEN_LOSS:
+            continue
+        if rule == 'margin':
+            if (wins + remaining) / (visits + remaining) >= best_wins / (best_visits + remaining):
+                return False
+        elif wins / visits + CONFIDENCE_Z * 0.5 / math.sqrt(visits) >= best_low:
+            return False
+    return True
+
+
+def _uct_worker(task):
+    """Run one independent UCT search in a worker process; returns its root statistics, iterations and evictions."""
+    game, num_simulations, variation, seed, options = task
+    random.seed(seed)
+
+    # time budgets arrive as a wall-clock deadline so that pool start-up counts against them
+    deadline = options.pop('deadline', None)
+    if deadline is not None:
+        options['time_limit_ms'] = max(0.0, (deadline - time.time()) * 1000)
+    tree = Tree(game, transpositions=options.pop('transpositions', False),
+                mcts_solver=options.pop('mcts_solver', False), node_budget=options.pop('node_budget', None),
+                byte_budget=options.pop('byte_budget', None), on_full=options.pop('on_full', 'evict'),
+                rave_equivalence=options.pop('rave_equivalence', 1000), symmetry=options.pop('symmetry', False))
+    iterations = run_simulations(tree, num_simulations, algorithm_type='UCT', variation=variation, **options)
+    return root_statistics(tree), root_proofs(tree), iterations, tree.evicted
+
+
+def parallel_root_statistics(game, num_simulations, variation='None', workers=2, seed=None, **options):
+    """
+    Root-parallel UCT: run one independent search per worker process and merge their root statistics.
+
+    Every worker searches the same root with the same budget and its own seed. The seeds are
+    drawn from random.Random(seed), so a fixed seed and worker count always give the same merged
+    statistics (for simulation budgets; time budgets depend on machine speed).
 
     Parameters:
-    - game: ConnectFour object representing the current state of the game.
-    - num_simulations: Total number of simulations to perform.
+    - options: transpositions, mcts_solver, the memory budget of the trees (node_budget, byte_budget,
+      on_full), rave_equivalence, symmetry and any keyword arguments of run_simulations (rollouts_per_leaf, ...).
 
     Returns:
-    - The best move determined by the PMCGS process.
+    - The merged {move: (wins, visits)} statistics, the root moves proven by any worker, and the total
+      numbers of iterations and of evicted nodes over all workers.
     """
-    # Step 1: Initialize the Tree with the root state
-    tree = Tree(game)
+    # without a seed the worker seeds follow the random module, so a seeded caller stays reproducible
+    seeds = random.Random(seed if seed is not None else random.getrandbits(64))
+    if options.get('time_limit_ms') is not None:
+        options['deadline'] = time.time() + options.pop('time_limit_ms') / 1000
+    tasks = [(game, num_simulations, variation, seeds.getrandbits(32), dict(options)) for _ in range(workers)]
+
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(_uct_worker, tasks)
+
+    # add up the wins and visits of every root move over all workers
+    merged = {}
+    proofs = {}
+    for statistics, proven, _, _ in results:
+        for move, (wins, visits) in statistics.items():
+            total_wins, total_visits = merged.get(move, (0, 0))
+            merged[move] = (total_wins + wins, total_visits + visits)
+        proofs.update(proven)  # proofs are exact, so any worker's proof holds
+    return merged, proofs, sum(result[2] for result in results), sum(result[3] for result in results)
+
+
+def report_search(stats, print_out, started, iterations, num_simulations, time_limit_ms, max_nodes):
+    """Record the search budget and the work actually done in stats, and print it in Brief/Verbose mode."""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if stats is not None:
+        stats.update({'num_simulations': num_simulations, 'time_limit_ms': time_limit_ms, 'max_nodes': max_nodes,
+                      'iterations': iterations, 'elapsed_ms': elapsed_ms})
+
     if (print_out == 'Verbose' or print_out == 'Brief'):
-        print(f'root player is: {tree.root.player}')
+        budget = []
+        if num_simulations is not None:
+            budget.append(f'{num_simulations} simulations')
+        if time_limit_ms is not None:
+            budget.append(f'{time_limit_ms} ms')
+        if max_nodes is not None:
+            budget.append(f'{max_nodes} nodes')
+        print(f'Budget: {", ".join(budget)}; completed {iterations} iterations in {elapsed_ms:.1f} ms')
 
-    for _ in range(num_simulations):
-        # Step 2: Selection phase - Select a node to expand
 
-        if variation == 'None':
-            selected_node = tree.select(algorithm_type='UCT', print_out=print_out)
-        elif variation == 'Exploitation':
-            selected_node = tree.select(algorithm_type='UCT', variation='Exploitation', print_out=print_out)
-        elif variation == 'Exploration':
-            selected_node = tree.select(algorithm_type='UCT', variation='Exploration', print_out=print_out)
-        elif variation == 'Heuristic':
-            selected_node = tree.select(algorithm_type='UCT', variation='Heuristic', print_out=print_out)
+def report_columns(stats, statistics):
+    """Record the win rate (for the player to move) and visits of every root move in stats['columns']."""
+    if stats is not None:
+        stats['columns'] = {move: {'value': wins / visits if visits > 0 else 0.0, 'visits': visits}
+                            for move, (wins, visits) in statistics.items()}
 
-        # If we reach a terminal node, backpropagate the result and continue
-        if selected_node.is_terminal:
-            result = selected_node.simulate_from_node(print_out=print_out)  # Simulate directly from terminal state
-            tree.backpropagate(selected_node, result, print_out=print_out)
-            continue
 
-        # Step 3: Expansion phase - Expand all legal moves from the selected node
-        selected_node.expand_node(print_out=print_out)  # Expands all possible child nodes for the selected node
+def proven_root_result(statistics, proofs, player):
+    """
+    Result the root is proven to lead to (-1 Red wins, 0 draw, 1 Yellow wins), or None.
+
+    player is the player to move at the root; proofs are values for that player, as from root_proofs.
+    """
+    if any(proven == PROVEN_WIN for proven in proofs.values()):
+        winner = player
+    elif not statistics or any(move not in proofs for move in statistics):
+        return None
+    elif any(proven != PROVEN_LOSS for proven in proofs.values()):
+        return 0
+    else:
+        winner = 'Y' if player == 'R' else 'R'
+    return -1 if winner == 'R' else 1
+
+
+def best_root_move(statistics, proofs=None):
+    """
+    Return the visited root move with the highest win rate, like Tree.best_move_uct.
+
+    With proofs from root_proofs, a move proven to win is always preferred and moves proven to
+    lose are only chosen when every move loses.
+    """
+    if proofs:
+        winning = {move: statistics[move] for move, proven in proofs.items() if proven == PROVEN_WIN}
+        not_losing = {move: counts for move, counts in statistics.items() if proofs.get(move) != PROVEN_LOSS}
+        statistics = winning or not_losing or statistics
+
+    best_move = None
+    best_rate = None
+    for move, (wins, visits) in statistics.items():
+        if visits > 0:  # Guard against division by zero for win rate calculation
+            rate = wins / visits
+            if best_rate is None or rate > best_rate:
+                best_move, best_rate = move, rate
+    return best_move
 
-        # Step 4: Simulation phase - Simulate for each child node and backpropagate results
-        for child in selected_node.children:
-            result = child.simulate_from_node(print_out=print_out)  # Simulate a random playthrough from this child node
-            tree.backpropagate(child, result, print_out=print_out)  # Backpropagate the result from this child
+
+def solved_move(game, print_out, stats, started, num_simulations, time_limit_ms, max_nodes):
+    """Return the best move of an exactly solved position; the proven result is recorded in stats."""
+    solver = Solver()
+    scores = solver.analyze(game)
+    move, score = best_scored_move(scores)
+    result = score_result(score, game.current_player)
+
+    report_search(stats, 'None', started, 0, num_simulations, time_limit_ms, max_nodes)
+    if stats is not None:
+        # the same columns as report_columns: the win rate of a proven win is 1 and of a draw or
+        # loss 0, from no simulations; the solver's score is kept alongside
+        stats.update({'solved_result': result, 'solver_nodes': solver.nodes,
+                      'columns': {col: {'value': 1.0 if col_score > 0 else 0.0, 'visits': 0, 'score': col_score}
+                                  for col, col_score in scores.items()}})
+
+    if (print_out == 'Verbose' or print_out == 'Brief'):
+        print(f'Solved exactly: {RESULT_NAMES[result]} with best play ({solver.nodes} positions searched)')
+        print(f'FINAL Move selected: {move}')
+    return move
+
+
+def uct_move(game, num_simulations, variation='None', print_out='None', rollouts_per_leaf=1, transpositions=False,
+             tree=None, workers=1, seed=None, time_limit_ms=None, max_nodes=None, stats=None, profiler=None,
+             book=None, solver_threshold=0, mcts_solver=False, expansion='all', rollout_policy='random',
+             stop=None, node_budget=None, byte_budget=None, on_full='evict', rave_equivalence=1000, early_stop=None,
+             symmetry=False):
+    """
+    UCT function to select the best move in a Connect Four game.
+
+    Parameters:
+    - game: ConnectFour object representing the current state of the game.
+    - num_simulations: Total number of simulations to perform (per worker when workers > 1).
+    - variation: 'None', 'Exploitation', 'Exploration', 'Heuristic' or 'RAVE' (UCB on win rates blended
+      with all-moves-as-first statistics, which guide the search well while visits are few).
+    - rollouts_per_leaf: Number of random playouts run from each new node.
+    - transpositions: Share statistics between move orders that reach the same position.
+    - tree: Optional Tree whose root is already at the game's position; its statistics are reused.
+    - workers: Number of processes searching the root independently; their root statistics are merged.
+    - seed: Optional random seed, for reproducible searches.
+    - time_limit_ms: Optional time budget; with num_simulations of 0 the search runs until it expires.
+    - max_nodes: Optional limit on the number of tree nodes (per worker).
+    - stats: Optional dictionary that receives the budget, the number of iterations completed and the
+      win rate and visits of every root move.
+    - profiler: Optional instrument.Profiler that collects per-phase timings and counters (single worker only).
+    - book: Optional opening book (an opening_book.OpeningBook or the path of one); positions found in it
+      are answered without searching.
+    - solver_threshold: Positions with at most this many empty cells are solved exactly by
+      solver.Solver instead of searched (0, the default, always searches; main.py, analyze.py and
+      server.py use 16).
+    - mcts_solver: Propagate proven wins and losses through the tree, skip moves proven to lose and
+      stop once the root is proven (a reused tree keeps the setting it was created with). Off by
+      default; main.py, analyze.py and server.py turn it on unless given --no-mcts-solver.
+    - expansion: 'all' (default) to add every child of the selected node and simulate each of
+      them, 'single' to add and simulate one new node per simulation (the CLIs' default).
+    - rollout_policy: 'random', 'threat' (take wins, block losses, prefer the centre) or a function
+      choosing rollout moves.
+    - stop: Optional event that ends the search early once set, e.g. to cancel pondering (single worker only).
+    - node_budget, byte_budget: Optional limits on the size of the tree (per worker). The search goes on
+      when one is reached: on_full='evict' prunes the least-visited leaf subtrees, 'freeze' stops
+      adding nodes (a reused tree keeps the budget it was created with).
+    - rave_equivalence: For 'RAVE', the visits of a node at which its own and the AMAF statistics weigh
+      about the same; smaller values trust the AMAF statistics for fewer visits.
+    - early_stop: Optional rule that ends the search once the best root move is settled: 'margin' when no
+      other move can overtake its win rate within the budget, 'confidence' when its win rate is
+      clearly ahead (see root_settled). A single legal move is played after one simulation. The
+      iterations left unused are recorded in stats['iterations_saved'].
+    - symmetry: Treat mirror-image positions as one: they share statistics through the transposition table,
+      and a position that is its own mirror image (such as the empty board) only searches the centre and
+      the columns left of it (a reused tree keeps the setting it was created with).
+
+    Returns:
+    - The best move determined by the PMCGS process.
+    """
+    if variation not in UCT_VARIATIONS:
+        raise ValueError(f"Unknown UCT variation: {variation}")
+    if workers > 1 and tree is not None:
+        raise ValueError("A reused tree can only be searched by a single worker.")
+    if workers > 1 and profiler is not None:
+        raise ValueError("Profiling is only supported for a single worker.")
+    if workers > 1 and stop is not None:
+        raise ValueError("A stop event is only supported for a single worker.")
+    if not num_simulations and (time_limit_ms is not None or max_nodes is not None):
+        num_simulations = None  # only the time/node budget applies
+    started = time.perf_counter()
+
+    if book is not None:
+        move = book_move(game, book, print_out)
+        if move is not None:
+            report_search(stats, 'None', started, 0, num_simulations, time_limit_ms, max_nodes)
+            return move
+
+    if solver_threshold and empty_cells(game) <= solver_threshold:
+        return solved_move(game, print_out, stats, started, num_simulations, time_limit_ms, max_nodes)
+
+    if workers > 1:
+        if (print_out == 'Verbose' or print_out == 'Brief'):
+            print(f'root player is: {"Y" if game.current_player == "R" else "R"}')
+            print(f'searching with {workers} workers')
+
+        statistics, proofs, iterations, evicted = parallel_root_statistics(game, num_simulations, variation,
+                                                                           workers, seed,
+                                                                  rollouts_per_leaf=rollouts_per_leaf,
+                                                                  transpositions=transpositions,
+                                                                  mcts_solver=mcts_solver, expansion=expansion,
+                                                                  rollout_policy=rollout_policy,
+                                                                  time_limit_ms=time_limit_ms, max_nodes=max_nodes,
+                                                                  node_budget=node_budget, byte_budget=byte_budget,
+                                                                  on_full=on_full, rave_equivalence=rave_equivalence,
+                                                                  early_stop=early_stop, symmetry=symmetry)
+    else:
+        if seed is not None:
+            random.seed(seed)
+
+        # Step 1: Initialize the Tree with the root state
+        if tree is None:
+            tree = Tree(game, transpositions=transpositions, mcts_solver=mcts_solver, node_budget=node_budget,
+                        byte_budget=byte_budget, on_full=on_full, rave_equivalence=rave_equivalence,
+                        symmetry=symmetry)
+        if (print_out == 'Verbose' or print_out == 'Brief'):
+            print(f'root player is: {tree.root.player}')
+        evicted = tree.evicted
+
+        iterations = run_simulations(tree, num_simulations, algorithm_type='UCT', variation=variation,
+                                     print_out=print_out, rollouts_per_leaf=rollouts_per_leaf,
+                                     time_limit_ms=time_limit_ms, max_nodes=max_nodes, profiler=profiler,
+                                     expansion=expansion, rollout_policy=rollout_policy, stop=stop,
+                                     early_stop=early_stop)
+        statistics = root_statistics(tree)
+        proofs = root_proofs(tree)
+        evicted = tree.evicted - evicted  # a reused tree may have evicted nodes in earlier searches
+
+    report_search(stats, print_out, started, iterations, num_simulations, time_limit_ms, max_nodes)
+    report_columns(stats, statistics)
+    if stats is not None:
+        stats['evicted'] = evicted
+    if early_stop is not None and num_simulations is not None:
+        saved = max(0, num_simulations * workers - iterations)
+        if stats is not None:
+            stats['iterations_saved'] = saved
+        if saved and (print_out == 'Verbose' or print_out == 'Brief'):
+            print(f'Stopped early: saved {saved} of {num_simulations * workers} iterations')
+    if evicted and (print_out == 'Verbose' or print_out == 'Brief'):
+        print(f'Evicted {evicted} nodes to stay within the memory budget')
+    result = proven_root_result(statistics, proofs, game.current_player)
+    if stats is not None:
+        stats['proven_result'] = result
+    if result is not None and (print_out == 'Verbose' or print_out == 'Brief'):
+        print(f'Root proven: {RESULT_NAMES[result]} with best play')
 
     # print the win rates of different moves
-    for child in tree.root.children:
+    for move, (wins, visits) in statistics.items():
         # Calculate win rate; guard against division by zero
-        win_rate = child.wins / child.visits if child.visits > 0 else 0.0
+        win_rate = wins / visits if visits > 0 else 0.0
         if (print_out == 'Verbose'):
-            print(f'Column {child.move}: {win_rate:.2f}')
+            print(f'Column {move}: {win_rate:.2f}')
 
 
-    # After all simulations, return the move of the most visited child of the root
-    best_move = tree.best_move_uct()
+    # After all simulations, return the move with the best win rate at the root (or a proven win)
+    best_move = best_root_move(statistics, proofs)
 
     if (print_out == 'Verbose' or print_out == 'Brief'):
         print(f'FINAL Move selected: {best_move}')
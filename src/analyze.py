@@ -0,0 +1,198 @@
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+from algorithms import uniform_random_move, pmcgs_move, uct_move
+import connect_four as c4
+
+ALGORITHMS = ('UR', 'PMCGS', 'UCT')
+# lines of one position: algorithm, player to move, six board rows
+RECORD_LINES = 8
+
+
+def read_positions(file, source):
+    """
+    Yields (source, number, algorithm, player, board) for every position in a file.
+
+    A file holds one or more positions in the format read by main.extract_board, one after the
+    other; blank lines between them are ignored. The file is read lazily, so a stream of any
+    length can be analysed.
+    """
+    lines = (line.strip() for line in file)
+    lines = (line for line in lines if line)
+    number = 0
+    while True:
+        record = list(islice(lines, RECORD_LINES))
+        if not record:
+            return
+        algorithm, player, *rows = record + [''] * (RECORD_LINES - len(record))
+        yield source, number, algorithm, player, [list(row) for row in rows]
+        number += 1
+
+
+def input_positions(paths):
+    """Positions of every path in turn; '-' (or no paths at all) reads standard input."""
+    for path in paths or ['-']:
+        if path == '-':
+            yield from read_positions(sys.stdin, '<stdin>')
+        else:
+            with open(path, 'r') as file:
+                yield from read_positions(file, path)
+
+
+def analyze_position(task):
+    """
+    Searches one position and returns its JSON record; runs in a worker process when the batch
+    uses more than one worker.
+
+    The record holds the move, the value (win rate for the player to move) and visits of every
+    column, the simulations completed and the elapsed time, or an 'error' if the position could
+    not be analysed. A position solved exactly has 0 visits per column, a value of 1 for a won
+    column and 0 otherwise, and the solver's score of each column.
+    """
+    index, (source, number, algorithm, player, board), settings = task
+    record = {'index': index, 'source': source, 'position': number}
+    algorithm = settings['algorithm'] or algorithm
+    if algorithm not in ALGORITHMS:
+        return dict(record, error=f'Unknown algorithm: {algorithm}')
+    if player not in ('R', 'Y'):
+        return dict(record, error=f'Unknown player: {player}')
+
+    game = c4.new_game(settings['engine'])
+    try:
+        game.load_board(board, player)
+    except ValueError as error:
+        return dict(record, error=str(error))
+    if game.game_over:
+        return dict(record, error='The game is already over.')
+
+    random.seed(settings['seed'])
+    stats = {}
+    started = time.perf_counter()
+    if algorithm == 'UR':
+        move = uniform_random_move(game)
+    elif algorithm == 'PMCGS':
+        move = pmcgs_move(game, settings['simulations'], stats=stats, **settings['pmcgs'])
+    else:
+        move = uct_move(game, settings['simulations'], settings['variation'], stats=stats, **settings['uct'])
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    record.update({'algorithm': algorithm, 'player': player, 'move': move,
+                   'columns': stats.get('columns', {}), 'simulations': stats.get('iterations', 0),
+                   'elapsed_ms': elapsed_ms})
+    for key in ('proven_result', 'solved_result'):
+        if stats.get(key) is not None:
+            record[key] = stats[key]
+    return record
+
+
+def analyze_batch(positions, settings, output, workers=1, in_flight=None):
+    """
+    Analyses positions and writes one JSON line to output as each finishes.
+
+    Parameters:
+    - positions: iterable of positions as yielded by read_positions; it is consumed only as fast
+      as the workers take positions, so memory stays bounded however long it is.
+    - settings: search settings shared by every position (see main()).
+    - output: file the records are written to; it is flushed after every record.
+    - workers: number of processes searching positions at the same time.
+    - in_flight: most positions queued or being searched at once (default twice the workers).
+
+    Returns:
+    - The number of positions analysed.
+    """
+    base_seed = settings['seed']
+    count = 0
+
+    def tasks():
+        for index, position in enumerate(positions):
+            # every position has its own seed, so results do not depend on which worker searches it
+            seed = random.Random(f'{base_seed}-{index}').getrandbits(32)
+            yield index, position, dict(settings, seed=seed)
+
+    def write(record):
+        nonlocal count
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+        count += 1
+
+    if workers > 1:
+        limit = in_flight or 2 * workers
+        with ProcessPoolExecutor(workers) as executor:
+            pending = set()
+            for task in tasks():
+                if len(pending) >= limit:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write(future.result())
+                pending.add(executor.submit(analyze_position, task))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future.result())
+    else:
+        for task in tasks():
+            write(analyze_position(task))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser('Connect Four analysis',
+                                     description='Analyse many positions and write one JSON line per position')
+    parser.add_argument('paths', nargs='*',
+                        help='files of positions in the game file format; - or nothing reads standard input')
+    parser.add_argument('--simulations', type=int, default=500, help='simulations per position')
+    parser.add_argument('--algorithm', type=str, default=None, choices=list(ALGORITHMS),
+                        help='algorithm for every position instead of the one named in its first line')
+    parser.add_argument('--variation', type=str, default='None',
+                        choices=['None', 'Exploitation', 'Exploration', 'Heuristic', 'RAVE'], help='UCT variation')
+    parser.add_argument('--engine', type=str, default='bitboard', choices=list(c4.ENGINES),
+                        help='board representation used by the game state')
+    parser.add_argument('--workers', type=int, default=1, help='processes analysing positions at the same time')
+    parser.add_argument('--in-flight', type=int, default=None,
+                        help='most positions queued or being searched at once (default twice the workers)')
+    parser.add_argument('--output', type=str, default=None, help='write the records to this file instead of stdout')
+    parser.add_argument('--seed', type=int, default=0, help='base seed for the searches')
+    parser.add_argument('--rollouts', type=int, default=1, help='random playouts per new node')
+    parser.add_argument('--transpositions', action='store_true',
+                        help='share statistics between move orders that reach the same position')
+    parser.add_argument('--time-limit', type=float, default=None, dest='time_limit_ms',
+                        help='stop each search after this many milliseconds')
+    parser.add_argument('--max-nodes', type=int, default=None, help='stop each search once its tree holds this many nodes')
+    parser.add_argument('--book', type=str, default=None, help='opening book file consulted before searching')
+    parser.add_argument('--solve-below', type=int, default=16, dest='solver_threshold',
+                        help='UCT solves positions with at most this many empty cells exactly (0 to always search)')
+    parser.add_argument('--no-mcts-solver', action='store_false', dest='mcts_solver',
+                        help='do not propagate proven wins and losses through the UCT tree')
+    parser.add_argument('--expansion', type=str, default='single', choices=['single', 'all'],
+                        help='add one new node per simulation, or every child of the selected node at once')
+    parser.add_argument('--rollout-policy', type=str, default='random', choices=['random', 'threat'],
+                        help='how rollouts pick moves')
+    parser.add_argument('--symmetry', action='store_true',
+                        help='UCT treats mirror-image positions as one')
+    args = parser.parse_args()
+
+    search = {'rollouts_per_leaf': args.rollouts, 'transpositions': args.transpositions,
+              'time_limit_ms': args.time_limit_ms, 'max_nodes': args.max_nodes, 'book': args.book,
+              'expansion': args.expansion, 'rollout_policy': args.rollout_policy}
+    settings = {'algorithm': args.algorithm, 'engine': args.engine, 'simulations': args.simulations,
+                'variation': args.variation, 'seed': args.seed, 'pmcgs': search,
+                'uct': dict(search, solver_threshold=args.solver_threshold, mcts_solver=args.mcts_solver,
+                            symmetry=args.symmetry)}
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    started = time.perf_counter()
+    try:
+        count = analyze_batch(input_positions(args.paths), settings, output, args.workers, args.in_flight)
+    finally:
+        if args.output:
+            output.close()
+    print(f'Analysed {count} positions in {time.perf_counter() - started:.1f} s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+
+from bitboard import WIDTH, HEIGHT, DIRECTIONS, TOP_MASK
+
+PLAYERS = ('R', 'Y')  # row 0 of the bitboard array holds Red, row 1 Yellow
+RESULTS = (-1, 1)  # result code for a win by the player at the same index
+
+
+def _has_four(bitboards):
+    """Vectorized four-in-a-row test over an array of bitboards."""
+    found = np.zeros(bitboards.shape, dtype=bool)
+    for shift in DIRECTIONS:
+        shift = np.uint64(shift)
+        pairs = bitboards & (bitboards >> shift)
+        found |= (pairs & (pairs >> (shift + shift))) != 0
+    return found
+
+
+def simulate_batch(state, num_games, rng=None):
+    """
+    Play num_games uniformly random games from the same position at once.
+
+    Parameters:
+    - state: the game state to start from; it is not modified.
+    - num_games: number of random playouts to run.
+    - rng: optional numpy Generator, for reproducible playouts.
+
+    Returns:
+    - A dictionary mapping each result to its count: -1 for Red wins, 0 for draws, 1 for Yellow wins.
+    """
+    counts = {-1: 0, 0: 0, 1: 0}
+
+    # a finished game has the same result in every playout
+    if state.game_over:
+        counts[RESULTS[PLAYERS.index(state.winner)] if state.winner else 0] = num_games
+        return counts
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    bitboards, heights = state.to_bitboards()
+
+    # one row per game: both players' bitboards, the column heights and the player to move
+    boards = np.tile(np.array([bitboards['R'], bitboards['Y']], dtype=np.uint64), (num_games, 1))
+    tops = np.tile(np.array(heights, dtype=np.uint64), (num_games, 1))
+    movers = np.full(num_games, PLAYERS.index(state.current_player), dtype=np.intp)
+    empty_cells = WIDTH * HEIGHT - sum(height % (HEIGHT + 1) for height in heights)
+    moves_left = np.full(num_games, empty_cells, dtype=np.int64)
+
+    top_mask = np.uint64(TOP_MASK)
+    one = np.uint64(1)
+    active = np.arange(num_games)  # indices of games still being played
+
+    while active.size:
+        game_tops = tops[active]
+
+        # pick a random column among the ones whose next cell is below the sentinel row
+        valid = ((one << game_tops) & top_mask) == 0
+        cols = np.argmax(rng.random(valid.shape) * valid, axis=1)
+
+        rows = np.arange(active.size)
+        game_movers = movers[active]
+        moved = boards[active, game_movers] | (one << game_tops[rows, cols])
+        boards[active, game_movers] = moved
+        tops[active, cols] += one
+        moves_left[active] -= 1
+
+        # record wins and draws, then keep playing the rest with the other player to move
+        won = _has_four(moved)
+        for index, result in enumerate(RESULTS):
+            counts[result] += int(np.count_nonzero(won & (game_movers == index)))
+        drawn = ~won & (moves_left[active] == 0)
+        counts[0] += int(np.count_nonzero(drawn))
+
+        active = active[~(won | drawn)]
+        movers[active] ^= 1
+
+    return counts
@@ -0,0 +1,237 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from functools import partial
+
+import connect_four as c4
+from algorithms import pmcgs_move, uct_move, run_simulations
+from main import extract_board
+from rollout_policy import ROLLOUT_POLICIES
+from tree import Tree
+
+# the stored baseline and the input positions live next to src/ in the repository root
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+INPUT_GLOB = os.path.join(ROOT, 'input', '*.txt')
+
+# number of random plies played from the empty board for the generated positions
+GENERATED_PLIES = {'opening': 4, 'midgame': 16, 'endgame': 30}
+
+# each throughput measurement is repeated this many times and the best run is reported
+REPEATS = 3
+
+
+def generated_position(plies, seed):
+    """Plays random moves from the empty board; returns (board, player) of a position that is not over."""
+    rng = random.Random(seed)
+    while True:
+        game = c4.ConnectFour()
+        for _ in range(plies):
+            game.make_move(rng.choice(game.valid_moves))
+            if game.game_over:
+                break
+        if not game.game_over:
+            return game.board, game.current_player
+
+
+def benchmark_positions():
+    """Positions to measure on: the input files that are still in play, plus generated positions."""
+    positions = {}
+    for path in sorted(glob.glob(INPUT_GLOB)):
+        _, player, board = extract_board(path)
+        game = c4.ConnectFour()
+        game.load_board([list(row) for row in board], player)
+        if not game.game_over:
+            positions[os.path.splitext(os.path.basename(path))[0]] = (board, player)
+
+    for phase, plies in GENERATED_PLIES.items():
+        positions[phase] = generated_position(plies, seed=plies)
+    return positions
+
+
+def load(engine, position):
+    """Creates a game of the given engine at a benchmark position."""
+    board, player = position
+    game = c4.new_game(engine)
+    game.load_board([list(row) for row in board], player)
+    return game
+
+
+def timed(function, duration, repeats=REPEATS):
+    """
+    Calls function repeatedly for about duration seconds; returns units of work per second.
+
+    function returns how many units of work one call did. The measurement is repeated and the
+    best rate is kept, since noise on a shared machine only ever makes a run slower.
+    """
+    best = 0.0
+    for _ in range(repeats):
+        done = 0
+        started = time.perf_counter()
+        while True:
+            done += function()
+            elapsed = time.perf_counter() - started
+            if elapsed >= duration:
+                break
+        best = max(best, done / elapsed)
+    return best
+
+
+def bench_moves(engine, position, duration):
+    """make_move + check_winner calls per second, playing random games to the end and undoing them."""
+    game = load(engine, position)
+    rng = random.Random(0)
+
+    def play():
+        moves = 0
+        while not game.game_over:
+            game.make_move(rng.choice(game.valid_moves))
+            game.check_winner(game.current_player)
+            moves += 1
+        for _ in range(moves):
+            game.undo_move()
+        return moves
+
+    return timed(play, duration)
+
+
+def bench_rollouts(engine, position, duration, policy=None):
+    """Rollouts per second with Node.simulate_from_node (uniformly random without a policy)."""
+    tree = Tree(load(engine, position))
+    root = tree.root
+    random.seed(0)
+    return timed(lambda: (root.simulate_from_node(tree.state, policy=policy), 1)[1], duration)
+
+
+def bench_search(engine, position, algorithm, duration):
+    """Search iterations per second of a full uct_move/pmcgs_move call."""
+    game = load(engine, position)
+    random.seed(0)
+    if algorithm == 'UCT':
+        # measure the sampling search: no endgame solver, and no MCTS-Solver proofs that end the search early
+        search = partial(uct_move, solver_threshold=0, mcts_solver=False)
+    else:
+        search = pmcgs_move
+
+    def run():
+        stats = {}
+        search(game, 0, time_limit_ms=duration * 1000, stats=stats)
+        return stats['iterations']
+
+    return timed(run, duration)
+
+
+def bench_memory(engine, position, iterations):
+    """Peak traced memory of a UCT search divided by the number of nodes it created, in bytes."""
+    game = load(engine, position)
+    random.seed(0)
+
+    tracemalloc.start()
+    tree = Tree(game)
+    run_simulations(tree, iterations, algorithm_type='UCT')
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak / len(tree.store)
+
+
+def run_benchmarks(duration=0.3, engines=tuple(c4.ENGINES), memory_iterations=2000):
+    """Runs every benchmark; returns {metric name: {'value', 'unit', 'better'}}."""
+    positions = benchmark_positions()
+    metrics = {}
+
+    def record(name, value, unit, better='higher'):
+        metrics[name] = {'value': value, 'unit': unit, 'better': better}
+        print(f'{name}: {value:,.1f} {unit}', file=sys.stderr)
+
+    for engine in engines:
+        for name, position in positions.items():
+            record(f'{engine}/moves/{name}', bench_moves(engine, position, duration), 'moves/s')
+            record(f'{engine}/rollouts/{name}', bench_rollouts(engine, position, duration), 'rollouts/s')
+        for name in GENERATED_PLIES:
+            record(f'{engine}/threat-rollouts/{name}',
+                   bench_rollouts(engine, positions[name], duration, ROLLOUT_POLICIES['threat']), 'rollouts/s')
+        for algorithm in ('UCT', 'PMCGS'):
+            for name in GENERATED_PLIES:
+                record(f'{engine}/{algorithm.lower()}/{name}',
+                       bench_search(engine, positions[name], algorithm, duration), 'iterations/s')
+        record(f'{engine}/memory/opening', bench_memory(engine, positions['opening'], memory_iterations),
+               'bytes/node', better='lower')
+
+    return metrics
+
+
+def compare(metrics, baseline, threshold):
+    """
+    Compares metrics with a baseline.
+
+    Returns a list of (name, baseline value, value, change) for every metric that got worse by
+    more than threshold (a fraction, e.g. 0.2 for 20%).
+    """
+    regressions = []
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['value']
+        after = metric['value']
+        change = (after - before) / before if before else 0.0
+        worse = -change if metric['better'] == 'higher' else change
+        if worse > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser('Connect Four benchmarks',
+                                     description='measure playouts/sec, search iterations/sec and memory per node')
+    parser.add_argument('--duration', type=float, default=0.3,
+                        help='seconds per run of each throughput measurement (every measurement runs 3 times)')
+    parser.add_argument('--engine', type=str, action='append', choices=list(c4.ENGINES),
+                        help='engine to measure (repeatable; default all)')
+    parser.add_argument('--output', type=str, default=None, help='write the JSON results to this file')
+    parser.add_argument('--baseline', type=str, default=BASELINE_PATH, help='baseline JSON file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='fraction a metric may get worse by before it counts as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    args = parser.parse_args()
+
+    metrics = run_benchmarks(args.duration, tuple(args.engine or c4.ENGINES))
+    results = {'python': platform.python_version(), 'machine': platform.machine(),
+               'duration': args.duration, 'metrics': metrics}
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            file.write(output + '\n')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one.', file=sys.stderr)
+        return 0
+
+    with open(args.baseline, 'r') as file:
+        baseline = json.load(file)['metrics']
+
+    regressions = compare(metrics, baseline, args.threshold)
+    for name, before, after, change in regressions:
+        print(f'REGRESSION {name}: {before:,.1f} -> {after:,.1f} ({change:+.0%})', file=sys.stderr)
+    if not regressions:
+        print(f'No regressions beyond {args.threshold:.0%} against {args.baseline}.', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,290 @@
+WIDTH = 7  # number of columns
+HEIGHT = 6  # number of rows
+STRIDE = HEIGHT + 1  # bits per column; the extra bit is a sentinel above the top row
+
+# one bit at the bottom of every column
+BOTTOM_MASK = sum(1 << (col * STRIDE) for col in range(WIDTH))
+# the sentinel bit above every column; a column is full once its height reaches it
+TOP_MASK = BOTTOM_MASK << HEIGHT
+# every playable cell (the sentinel row excluded)
+BOARD_MASK = BOTTOM_MASK * ((1 << HEIGHT) - 1)
+
+# shifts for the vertical, horizontal and the two diagonal directions
+DIRECTIONS = (1, STRIDE, STRIDE - 1, STRIDE + 1)
+# the bits of one column, and of the centre column
+COLUMN_BITS = (1 << STRIDE) - 1
+CENTER_MASK = COLUMN_BITS << (WIDTH // 2 * STRIDE)
+
+
+def has_four(bitboard):
+    """Checks if a bitboard contains four pieces in a row in any direction."""
+    for shift in DIRECTIONS:
+        pairs = bitboard & (bitboard >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+def mirror(bitboard):
+    """
+    Mirrors a bitboard, a position key or any other value laid out column by column left to right.
+
+    Column c moves to column WIDTH - 1 - c; the centre column stays in place.
+    """
+    return (((bitboard & COLUMN_BITS) << 6 * STRIDE) | ((bitboard & COLUMN_BITS << STRIDE) << 4 * STRIDE)
+            | ((bitboard & COLUMN_BITS << 2 * STRIDE) << 2 * STRIDE) | (bitboard & CENTER_MASK)
+            | ((bitboard >> 2 * STRIDE) & COLUMN_BITS << 2 * STRIDE) | ((bitboard >> 4 * STRIDE) & COLUMN_BITS << STRIDE)
+            | ((bitboard >> 6 * STRIDE) & COLUMN_BITS))
+
+
+def canonical_key(key):
+    """
+    Returns the smaller of a position key and the key of its mirror image.
+
+    A position and its mirror image have the same canonical key; the position whose own key
+    it is is in canonical orientation.
+    """
+    mirrored = mirror(key)
+    return mirrored if mirrored < key else key
+
+
+def is_mirrored(key):
+    """Whether a position key is the mirror image of the canonical orientation of its position."""
+    return mirror(key) < key
+
+
+def is_symmetric(key):
+    """Whether a position key is that of a position which is its own mirror image."""
+    return mirror(key) == key
+
+
+def winning_cells(position, mask):
+    """Empty cells that would complete four in a row for the player whose pieces are position."""
+    # vertical: three pieces stacked right below the cell
+    cells = (position << 1) & (position << 2) & (position << 3)
+
+    for shift in (STRIDE, STRIDE - 1, STRIDE + 1):  # horizontal and the two diagonals
+        pair = (position << shift) & (position << 2 * shift)
+        cells |= pair & (position << 3 * shift)
+        cells |= pair & (position >> shift)
+        pair = (position >> shift) & (position >> 2 * shift)
+        cells |= pair & (position << shift)
+        cells |= pair & (position >> 3 * shift)
+
+    return cells & (BOARD_MASK ^ mask)
+
+
+def board_to_bitboards(board):
+    """Converts a 6x7 list board into a dictionary of bitboards and a list of column heights."""
+    bitboards = {'R': 0, 'Y': 0}
+    heights = []
+
+    for col in range(WIDTH):
+        count = 0  # number of pieces stacked in this column
+        for row in reversed(range(HEIGHT)):  # bottom row of the list board is the last one
+            cell = board[row][col]
+            if cell in bitboards:
+                bitboards[cell] |= 1 << (col * STRIDE + HEIGHT - 1 - row)
+                count += 1
+        heights.append(col * STRIDE + count)
+
+    return bitboards, heights
+
+
+class BitboardConnectFour:
+    """
+    Connect Four game state backed by two 49-bit integers.
+
+    Bit (col * 7 + row) of a player's bitboard is set when that player has a piece in the
+    given column, counting rows from the bottom. It offers the same interface as
+    connect_four.ConnectFour so the two can be used interchangeably.
+    """
+
+    def __init__(self):
+        # one bitboard per player
+        self.bitboards = {'R': 0, 'Y': 0}
+        # index of the next free bit in each column
+        self.heights = [col * STRIDE for col in range(WIDTH)]
+        # Dictionary to map player symbols to their respective colors
+        self.players = {'R': 'Red', 'Y': 'Yellow'}
+        # set the starting player to R
+        self.current_player = 'R'
+        # keep track of valid moves left
+        self.valid_moves = [col for col in range(WIDTH)]
+        # number of pieces on the board
+        self.moves_played = 0
+        # Track the game status
+        self.game_over = False
+        # Status of game
+        self.winner = None
+        # if it's a draw
+        self.draw = False
+        # moves made since the board was loaded, so they can be undone
+        self.history = []
+
+    @property
+    def board(self):
+        """Builds the 6x7 list view of the board ('O' marks an empty slot)."""
+        board = [['O'] * WIDTH for _ in range(HEIGHT)]
+        for piece, bitboard in self.bitboards.items():
+            for col in range(WIDTH):
+                for row in range(HEIGHT):
+                    if bitboard & (1 << (col * STRIDE + row)):
+                        board[HEIGHT - 1 - row][col] = piece
+        return board
+
+    def load_board(self, board_array, player):
+        """Loads a specified 2D array into the board."""
+        self.current_player = player
+
+        if len(board_array) == HEIGHT and all(len(row) == WIDTH for row in board_array):
+            self.bitboards, self.heights = board_to_bitboards(board_array)
+        else:
+            raise ValueError("Invalid board size. Expected a 6x7 board.")
+
+        self.moves_played = sum(height - col * STRIDE for col, height in enumerate(self.heights))
+        self.history = []
+        self.update_valid_moves()
+        self.update_game_status()
+
+    def display_board(self):
+        """Prints the current state of the board."""
+        for row in self.board:
+            print(' '.join(row))  # Join each row's elements with spaces for better readability
+        print("0 1 2 3 4 5 6")  # Column numbers for user reference
+
+    def is_valid_move(self, col):
+        """Checks if the column is valid for a move."""
+        return not (1 << self.heights[col]) & TOP_MASK  # Valid until the height reaches the sentinel row
+
+    def update_valid_moves(self):
+        """Updates the list of valid moves from the mask of next free cells."""
+        height_mask = sum(1 << height for height in self.heights)
+        open_cells = height_mask & ~TOP_MASK
+        self.valid_moves = [col for col in range(WIDTH) if open_cells & (1 << self.heights[col])]
+
+    def update_game_status(self):
+        # Check for a winner or a draw and update game status
+        if self.check_winner(self.current_player):
+            self.game_over = True
+            self.winner = self.current_player
+            return {'game_over': True, 'winner': self.winner, 'message': 'Player wins!'}
+        elif self.is_draw():
+            self.game_over = True
+            self.draw = True
+            return {'game_over': True, 'winner': None, 'message': 'It\'s a draw!'}
+        else:
+            return {'game_over': False, 'winner': None, 'message': 'Game continues'}
+
+    def make_move(self, col):
+        """Places the current player's piece in the specified column and updates the board."""
+        height = self.heights[col]
+        if (1 << height) & TOP_MASK:
+            print(f"Invalid move in column {col}.")
+            return None  # Indicate that the move was invalid
+
+        player = self.current_player
+        # remember everything the move changes so undo_move can restore it
+        self.history.append((col, player, self.game_over, self.winner, self.draw))
+
+        bitboard = self.bitboards[player] | (1 << height)
+        self.bitboards[player] = bitboard
+        self.heights[col] = height + 1
+        self.moves_played += 1
+
+        # the column is no longer playable once its height reaches the sentinel row
+        if (2 << height) & TOP_MASK:
+            self.valid_moves = [move for move in self.valid_moves if move != col]
+
+        # Only the piece just placed can complete a line, so only the mover's bitboard is checked
+        if has_four(bitboard):
+            self.game_over = True
+            self.winner = player
+            return {'game_over': True, 'winner': player, 'message': 'Player wins!'}
+        elif self.moves_played == WIDTH * HEIGHT:
+            self.game_over = True
+            self.draw = True
+            return {'game_over': True, 'winner': None, 'message': 'It\'s a draw!'}
+
+        # Switch player since the game is not over
+        self.current_player = 'Y' if player == 'R' else 'R'
+        return {'game_over': False, 'winner': None, 'message': 'Game continues'}
+
+    def undo_move(self):
+        """Takes back the most recent move and restores the game status from before it."""
+        col, player, game_over, winner, draw = self.history.pop()
+
+        height = self.heights[col] - 1
+        self.heights[col] = height
+        self.bitboards[player] ^= 1 << height
+        self.moves_played -= 1
+
+        # the column was full before the undo, so it becomes playable again
+        if (2 << height) & TOP_MASK:
+            self.update_valid_moves()
+
+        self.current_player = player
+        self.game_over = game_over
+        self.winner = winner
+        self.draw = draw
+
+    def key(self):
+        """
+        Returns an integer that identifies the position.
+
+        The key is mask + bottom + Red's pieces: in every column the highest set bit marks the
+        height and the bits below it are Red's pieces, so no two positions share a key.
+        """
+        red = self.bitboards['R']
+        return (red | self.bitboards['Y']) + BOTTOM_MASK + red
+
+    def canonical_key(self):
+        """Returns a key shared by the position and its mirror image (see canonical_key)."""
+        return canonical_key(self.key())
+
+    def to_bitboards(self):
+        """
+        Returns the players' bitboards and the column heights, as board_to_bitboards does.
+
+        They are the engine's own dictionary and list, for reading only.
+        """
+        return self.bitboards, self.heights
+
+    def check_winner(self, piece):
+        """Checks for a win condition for the specified piece."""
+        return has_four(self.bitboards[piece])
+
+    def winning_moves(self, piece):
+        """Returns the columns where the specified piece would complete four in a row if played now."""
+        mask = self.bitboards['R'] | self.bitboards['Y']
+        cells = winning_cells(self.bitboards[piece], mask) & (mask + BOTTOM_MASK)
+        if not cells:
+            return []
+        return [col for col in self.valid_moves if cells & (1 << self.heights[col])]
+
+    def switch_player(self):
+        """Switches the current player."""
+        self.current_player = 'Y' if self.current_player == 'R' else 'R'
+
+    def is_draw(self):
+        # If no empty slots remain and no winner, it's a draw
+        return self.moves_played == WIDTH * HEIGHT
+
+    def copy(self):
+        """Returns an independent copy of the game state."""
+        clone = BitboardConnectFour.__new__(BitboardConnectFour)
+        clone.bitboards = dict(self.bitboards)
+        clone.heights = list(self.heights)
+        clone.players = self.players
+        clone.current_player = self.current_player
+        clone.valid_moves = list(self.valid_moves)
+        clone.moves_played = self.moves_played
+        clone.game_over = self.game_over
+        clone.winner = self.winner
+        clone.draw = self.draw
+        clone.history = list(self.history)
+        return clone
+
+    def __deepcopy__(self, memo):
+        # the state only holds ints and flat lists, so a shallow rebuild is a full copy
+        return self.copy()
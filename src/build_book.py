@@ -0,0 +1,109 @@
+import argparse
+import multiprocessing
+import random
+import time
+
+import connect_four as c4
+from bitboard import WIDTH, is_mirrored
+from algorithms import run_simulations, root_statistics, root_proofs, best_root_move
+from opening_book import HEADER, RECORD, MAGIC, VERSION
+from tree import Tree
+
+
+def book_positions(max_ply):
+    """Move sequences reaching every unfinished position with at most max_ply pieces, one per mirrored pair."""
+    positions = []
+    seen = set()
+    game = c4.new_game('bitboard')
+
+    def visit(moves):
+        key = game.canonical_key()
+        if key in seen:
+            return
+        seen.add(key)
+        positions.append(tuple(moves))
+        if len(moves) == max_ply:
+            return
+        for move in list(game.valid_moves):
+            game.make_move(move)
+            if not game.game_over:
+                visit(moves + [move])
+            game.undo_move()
+
+    visit([])
+    return positions
+
+
+def _search_position(task):
+    """Searches one book position; returns its (canonical key, move, value) record, the move in canonical orientation."""
+    moves, num_simulations, variation, seed = task
+    random.seed(seed)
+
+    game = c4.new_game('bitboard')
+    for move in moves:
+        game.make_move(move)
+
+    tree = Tree(game, transpositions=True, mcts_solver=True, symmetry=True)
+    run_simulations(tree, num_simulations, algorithm_type='UCT', variation=variation, expansion='single')
+    statistics = root_statistics(tree)
+    move = best_root_move(statistics, root_proofs(tree))
+    wins, visits = statistics[move]
+    if is_mirrored(game.key()):
+        move = WIDTH - 1 - move
+    return game.canonical_key(), move, round(wins / visits * 1000)
+
+
+def build_book(path, max_ply, num_simulations, variation='None', workers=1, seed=0, print_out='None'):
+    """
+    Searches every position up to max_ply with UCT and writes the best moves to a book file.
+
+    Parameters:
+    - path: File to write.
+    - max_ply: Deepest position (number of pieces on the board) to include.
+    - num_simulations: UCT simulations per position.
+    - workers: Number of processes searching positions in parallel.
+    - seed: Seed from which every position's search seed is derived, so a build is reproducible.
+
+    Returns:
+    - The number of records written.
+    """
+    positions = book_positions(max_ply)
+    seeds = random.Random(seed)
+    tasks = [(moves, num_simulations, variation, seeds.getrandbits(32)) for moves in positions]
+    started = time.perf_counter()
+
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            records = pool.map(_search_position, tasks, chunksize=8)
+    else:
+        records = []
+        for task in tasks:
+            records.append(_search_position(task))
+            if (print_out == 'Verbose' and len(records) % 100 == 0):
+                print(f'{len(records)}/{len(tasks)} positions searched')
+
+    records.sort()
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, max_ply, len(records)))
+        for record in records:
+            file.write(RECORD.pack(*record))
+
+    if (print_out == 'Verbose' or print_out == 'Brief'):
+        print(f'Wrote {len(records)} positions up to ply {max_ply} to {path} '
+              f'in {time.perf_counter() - started:.1f} s')
+    return len(records)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Connect Four opening book',
+                                     description='search every position up to a ply offline and store the best moves')
+    parser.add_argument('output', type=str, help='book file to write')
+    parser.add_argument('--plies', type=int, default=4, help='deepest ply to include')
+    parser.add_argument('--simulations', type=int, default=5000, help='UCT simulations per position')
+    parser.add_argument('--variation', type=str, default='None', help='UCT variation used for the searches')
+    parser.add_argument('--workers', type=int, default=1, help='processes searching positions in parallel')
+    parser.add_argument('--seed', type=int, default=0, help='seed for reproducible books')
+    args = parser.parse_args()
+
+    build_book(args.output, args.plies, args.simulations, args.variation, args.workers, args.seed,
+               print_out='Verbose')
@@ -1,4 +1,5 @@
 import random
+from bitboard import BitboardConnectFour, BOTTOM_MASK, STRIDE, board_to_bitboards, canonical_key
 
 
 class ConnectFour:
@@ -17,6 +18,10 @@ class ConnectFour:
         self.winner = None
         # if it's a draw
         self.draw = False
+        # moves made since the board was loaded, so they can be undone
+        self.history = []
+        # position key, kept in step with the board (see key())
+        self.position_key = BOTTOM_MASK
 
     def load_board(self, board_array, player):
         """Loads a specified 2D array into the board."""
@@ -27,6 +32,10 @@ class ConnectFour:
         else:
             raise ValueError("Invalid board size. Expected a 6x7 board.")
 
+        self.history = []
+        bitboards, heights = board_to_bitboards(board_array)
+        red = bitboards['R']
+        self.position_key = (red | bitboards['Y']) + BOTTOM_MASK + red
         self.update_valid_moves()
         self.update_game_status()
 
@@ -61,9 +70,13 @@ class ConnectFour:
     def make_move(self, col):
         """Places the current player's piece in the specified column and updates the board."""
         if self.is_valid_move(col):
-            for row in reversed(self.board):  # Start from the bottom row to find the lowest available slot
-                if row[col] == 'O':  # If the slot is empty
-                    row[col] = self.current_player  # Place the player's piece
+            # remember everything the move changes so undo_move can restore it
+            self.history.append((col, self.current_player, self.game_over, self.winner, self.draw))
+
+            for row in reversed(range(len(self.board))):  # Start from the bottom row to find the lowest available slot
+                if self.board[row][col] == 'O':  # If the slot is empty
+                    self.board[row][col] = self.current_player  # Place the player's piece
+                    self.position_key += self._key_step(row, col, self.current_player)
                     break
 
             # Check if this move leads to a win or draw
@@ -77,6 +90,40 @@ class ConnectFour:
             print(f"Invalid move in column {col}.")
             return None  # Indicate that the move was invalid
 
+    def undo_move(self):
+        """Takes back the most recent move and restores the game status from before it."""
+        col, player, game_over, winner, draw = self.history.pop()
+
+        for row in range(len(self.board)):  # Start from the top row to find the highest piece
+            if self.board[row][col] != 'O':
+                self.board[row][col] = 'O'  # Remove the piece
+                self.position_key -= self._key_step(row, col, player)
+                break
+
+        self.current_player = player
+        self.game_over = game_over
+        self.winner = winner
+        self.draw = draw
+        self.update_valid_moves()
+
+    def key(self):
+        """Returns an integer that identifies the position; the same key as BitboardConnectFour.key()."""
+        return self.position_key
+
+    def canonical_key(self):
+        """Returns a key shared by the position and its mirror image; the same as BitboardConnectFour.canonical_key()."""
+        return canonical_key(self.position_key)
+
+    def to_bitboards(self):
+        """Returns the bitboards and column heights of the position, as BitboardConnectFour.to_bitboards() does."""
+        return board_to_bitboards(self.board)
+
+    def _key_step(self, row, col, piece):
+        """Amount the position key changes by when a piece is placed at (row, col)."""
+        bit = 1 << (col * STRIDE + len(self.board) - 1 - row)
+        # the column's height marker moves up one bit, and Red's pieces are also added in
+        return bit + bit if piece == 'R' else bit
+
     def check_winner(self, piece):
         """Checks for a win condition for the specified piece."""
         # Check horizontal, vertical, and diagonal for four-in-a-row
@@ -84,6 +131,31 @@ class ConnectFour:
                 self._check_vertical(piece) or
                 self._check_diagonal(piece))
 
+    def winning_moves(self, piece):
+        """Returns the columns where the specified piece would complete four in a row if played now."""
+        moves = []
+        for col in self.valid_moves:
+            row = len(self.board) - 1
+            while self.board[row][col] != 'O':  # find the slot the piece would land in
+                row -= 1
+            if self._completes_four(row, col, piece):
+                moves.append(col)
+        return moves
+
+    def _completes_four(self, row, col, piece):
+        """Checks if a piece placed at (row, col) would be part of four in a row."""
+        board = self.board
+        for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1  # the new piece itself
+            for sign in (1, -1):  # walk away from the new piece in both directions
+                r, c = row + sign * d_row, col + sign * d_col
+                while 0 <= r < 6 and 0 <= c < 7 and board[r][c] == piece:
+                    count += 1
+                    r, c = r + sign * d_row, c + sign * d_col
+            if count >= 4:
+                return True
+        return False
+
     def _check_horizontal(self, piece):
         """Checks horizontal win condition."""
         for row in self.board:
@@ -146,10 +218,27 @@ class ConnectFour:
         # If no empty slots remain and no winner, it's a draw
         return all(cell != 'O' for row in self.board for cell in row)
 
-
-
-
-
-
-
-
+    def copy(self):
+        """Returns an independent copy of the game state."""
+        clone = ConnectFour.__new__(ConnectFour)
+        clone.board = [list(row) for row in self.board]
+        clone.players = self.players
+        clone.current_player = self.current_player
+        clone.valid_moves = list(self.valid_moves)
+        clone.game_over = self.game_over
+        clone.winner = self.winner
+        clone.draw = self.draw
+        clone.history = list(self.history)
+        clone.position_key = self.position_key
+        return clone
+
+
+# board engines that can be selected with the engine switch
+ENGINES = {'list': ConnectFour, 'bitboard': BitboardConnectFour}
+
+
+def new_game(engine='list'):
+    """Creates an empty game using the requested board engine ('list' or 'bitboard')."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown board engine: {engine}")
+    return ENGINES[engine]()
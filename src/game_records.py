@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+MAGIC = b'C4GR'
+VERSION = 1
+# magic, format version, length of the JSON roster that follows the header
+HEADER = struct.Struct('<4sHI')
+# game seed, red agent id, yellow agent id, number of moves (low 6 bits) and result code (high 2 bits)
+RECORD = struct.Struct('<IBBB')
+# result codes: draw, Red wins, Yellow wins, unfinished
+RESULT_CODES = {0: 0, -1: 1, 1: 2, None: 3}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+MOVE_BITS = 3
+# the four moves packed in every 12-bit value, to decode four moves per step
+QUADS = [tuple((value >> (MOVE_BITS * i)) & 7 for i in range(4)) for value in range(1 << (4 * MOVE_BITS))]
+
+GameRecord = namedtuple('GameRecord', ['seed', 'red', 'yellow', 'result', 'moves'])
+
+
+def pack_moves(moves):
+    """Packs columns (0-6) into 3-bit codes, first move in the lowest bits."""
+    value = 0
+    for i, move in enumerate(moves):
+        value |= move << (MOVE_BITS * i)
+    return value.to_bytes(packed_size(len(moves)), 'little')
+
+
+def unpack_moves(data, count):
+    """Inverse of pack_moves: the first count columns packed in data."""
+    value = int.from_bytes(data, 'little')
+    moves = []
+    for shift in range(0, MOVE_BITS * count, 4 * MOVE_BITS):
+        moves.extend(QUADS[(value >> shift) & 4095])
+    del moves[count:]
+    return moves
+
+
+def packed_size(count):
+    """Bytes taken by count packed moves."""
+    return (MOVE_BITS * count + 7) // 8
+
+
+def encode_record(moves, result, red, yellow, seed):
+    """
+    Returns the bytes of one game record.
+
+    Parameters:
+    - moves: columns played, Red first.
+    - result: -1 Red wins, 0 draw, 1 Yellow wins, None for a game that was not finished.
+    - red, yellow: agent ids (0-255), usually indices into the file's roster.
+    - seed: the game's 32-bit seed, so it can be replayed.
+    """
+    if len(moves) > 63:
+        raise ValueError('A game record holds at most 63 moves.')
+    header = RECORD.pack(seed, red, yellow, len(moves) | RESULT_CODES[result] << 6)
+    return header + pack_moves(moves)
+
+
+class GameWriter:
+    """
+    Streaming writer of a game record file.
+
+    The file is a header with the roster of agents as JSON, followed by variable-length game
+    records: a fixed part (seed, agent ids, move count and result) and the moves packed three
+    bits each, so a typical game takes well under 20 bytes. Records are appended as they are
+    written; nothing is kept in memory.
+    """
+
+    def __init__(self, path, roster=None, append=False):
+        """
+        Parameters:
+        - path: file to write.
+        - roster: JSON-serialisable list describing the agents the ids refer to.
+        - append: add to an existing file instead of replacing it; its roster must match.
+        """
+        roster = [list(agent) if isinstance(agent, tuple) else agent for agent in roster or []]
+        self.existing = 0  # complete records already in the file
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with GameRecords(path) as records:
+                if records.roster != roster:
+                    raise ValueError(f'{path} was written for a different roster.')
+                end = records.end()
+                self.existing = len(records)
+            self.file = open(path, 'r+b')
+            # drop a record cut short by an interrupted writer, or every later record would be misread
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.file = open(path, 'wb')
+            blob = json.dumps(roster).encode()
+            self.file.write(HEADER.pack(MAGIC, VERSION, len(blob)) + blob)
+        self.path = path
+        self.count = 0  # records written by this writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, moves, result, red=0, yellow=0, seed=0):
+        """Appends one game (see encode_record)."""
+        self.file.write(encode_record(moves, result, red, yellow, seed))
+        self.count += 1
+
+    def write_encoded(self, data, count=1):
+        """Appends records already encoded with encode_record, e.g. by a worker process."""
+        self.file.write(data)
+        self.count += count
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class GameRecords:
+    """
+    Read-only view of a game record file, backed by a memory-mapped file.
+
+    Iterating yields GameRecord tuples; results() scans only the fixed part of every record,
+    which is enough to tally scores without decoding any moves.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # mmap refuses empty files
+            self.file.close()
+            raise ValueError(f'{path} is not a game record file.')
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a game record file.')
+
+        magic, version, roster_size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a game record file (version {VERSION}).')
+        self.roster = json.loads(self.data[HEADER.size:HEADER.size + roster_size].decode())
+        self.start = HEADER.size + roster_size  # offset of the first record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def _offsets(self):
+        """Yields (offset of the moves, seed, red, yellow, count and result byte) of every record."""
+        data = self.data
+        end = len(data)
+        offset = self.start
+        unpack = RECORD.unpack_from
+        while offset + RECORD.size <= end:
+            seed, red, yellow, info = unpack(data, offset)
+            offset += RECORD.size
+            size = packed_size(info & 63)
+            if offset + size > end:
+                break  # a record cut short by an interrupted writer
+            yield offset, seed, red, yellow, info
+            offset += size
+
+    def __iter__(self):
+        data = self.data
+        for offset, seed, red, yellow, info in self._offsets():
+            count = info & 63
+            moves = unpack_moves(data[offset:offset + packed_size(count)], count)
+            yield GameRecord(seed, red, yellow, RESULTS[info >> 6], moves)
+
+    def __len__(self):
+        return sum(1 for _ in self._offsets())
+
+    def end(self):
+        """Offset just past the last complete record; any bytes after it belong to a cut-off record."""
+        end = self.start
+        for offset, _, _, _, info in self._offsets():
+            end = offset + packed_size(info & 63)
+        return end
+
+    def results(self):
+        """Yields (red, yellow, result) of every game without decoding the moves."""
+        for _, _, red, yellow, info in self._offsets():
+            yield red, yellow, RESULTS[info >> 6]
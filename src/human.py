@@ -1,20 +1,27 @@
 import random
 import math
+import threading
 from algorithms import uniform_random_move
 from algorithms import pmcgs_move
 from algorithms import uct_move
-from connect_four import ConnectFour
+from connect_four import new_game
 from node import Node
 from tree import Tree
+from session import SearchSession
 
-def ai_move(game, algorithm='UR'):
-    """Generates a valid move for the AI based on the chosen algorithm."""
+PONDER_SIMULATIONS = 20000  # most simulations the AI runs while the human thinks
+
+def ai_move(game, algorithm='UR', session=None, book=None):
+    """Generates a valid move for the AI based on the chosen algorithm; book is an optional opening book path."""
     if algorithm == "UR":
         return uniform_random_move(game)
     elif algorithm == "PMCGS":
-        return pmcgs(game, 100)
+        return pmcgs_move(game, 100, book=book)
     elif algorithm == "UCT":
-        return uct_move(game, 100)
+        if session is not None:
+            # continue from the tree kept since the AI's last move; simulations run while pondering count
+            return session.move(game, count_reused=True)
+        return uct_move(game, 100, book=book)
     else:
         raise ValueError(f"Unknown AI algorithm: {algorithm}")
 
@@ -30,17 +37,30 @@ def human_move(game):
         except ValueError:
             print("Please enter a valid integer between 0 and 6.")
 
-def play_game(algorithm):
+def play_game(algorithm, engine='list', book=None):
     """Simulates a game of Connect Four between an AI and a human player."""
-    game = ConnectFour()
+    game = new_game(engine)
     game.display_board()
+    session = SearchSession(100, book=book) if algorithm == "UCT" else None
+    stop = threading.Event()
 
     while not game.game_over:
         if game.current_player == 'R':  # Human player
-            move = human_move(game)
+            # the AI searches the position in the background while the human thinks
+            pondering = None
+            if session is not None:
+                stop.clear()
+                pondering = threading.Thread(target=session.ponder, args=(game, stop, PONDER_SIMULATIONS), daemon=True)
+                pondering.start()
+            try:
+                move = human_move(game)
+            finally:
+                if pondering is not None:
+                    stop.set()
+                    pondering.join()
             print(f"Player {game.current_player} chooses column {move}.")
         else:  # AI player
-            move = ai_move(game, algorithm)
+            move = ai_move(game, algorithm, session, book)
             print(f"AI chooses column {move}.")
 
         game.make_move(move)
@@ -0,0 +1,158 @@
+import time
+from collections import deque
+
+from node import Node
+
+
+class TraceSink:
+    """
+    Receives the events of a search.
+
+    The tree and node methods take an optional sink and report one event per phase, after the
+    phase's loop has finished, so a search without a sink does no extra work in its inner loops.
+    This base class ignores every event; subclasses override the ones they need.
+    """
+
+    def selected(self, store, path, moves):
+        """A selection descended along path (node handles from the root), playing moves."""
+
+    def expanded(self, store, node, player, moves):
+        """Node was expanded with a child for each move, to be played by player."""
+
+    def rollout(self, moves, result):
+        """A random rollout played moves and ended with result (-1 Red, 0 draw, 1 Yellow)."""
+
+    def backpropagated(self, store, handles):
+        """The statistics of handles were updated, deepest node first."""
+
+
+class PrintSink(TraceSink):
+    """Prints the messages of the 'Verbose' output mode."""
+
+    def selected(self, store, path, moves):
+        for child, move in zip(path[1:], moves):
+            print(f'wi: {store.wins[child]}; ni: {store.visits[child]}; Move selected: {move}')
+        if store.terminal[path[-1]]:
+            print(f'TERMINAL NODE VALUE: {Node(store, path[-1]).terminal_value}')
+
+    def expanded(self, store, node, player, moves):
+        for move in moves:
+            print(f'NODE ADDED for {player} player for move {move}')
+
+    def rollout(self, moves, result):
+        for move in moves:
+            print(f'Move selected: {move}')
+
+    def backpropagated(self, store, handles):
+        for index in handles:
+            print(f'Updated values - wi: {store.wins[index]}; ni: {store.visits[index]}')
+
+
+def trace_sink(print_out='None', profiler=None):
+    """Returns the sink for a search: the profiler, a PrintSink in 'Verbose' mode, both, or None."""
+    printer = PrintSink() if print_out == 'Verbose' else None
+    if profiler is None:
+        return printer
+    profiler.echo = printer
+    return profiler
+
+
+class Profiler(TraceSink):
+    """
+    Per-phase timers and counters for a search, with an optional buffer of trace events.
+
+    Pass one to uct_move or pmcgs_move (or run_simulations) and read summary() afterwards. The
+    phases are select, expand, rollout and backprop; the counters record the selection depth,
+    the expansions and children created, the rollout lengths and the backpropagation steps.
+    """
+    PHASES = ('select', 'expand', 'rollout', 'backprop')
+
+    def __init__(self, trace=0):
+        """
+        Parameters:
+        - trace: number of most recent events to keep (0 for none). Each event is a tuple whose
+          first item names the phase.
+        """
+        self.seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.counters = {'select_depth': 0, 'max_select_depth': 0, 'terminal_selections': 0,
+                         'expansions': 0, 'children': 0,
+                         'rollouts': 0, 'rollout_moves': 0, 'backprop_steps': 0}
+        self.events = deque(maxlen=trace) if trace else None
+        self.iterations = 0
+        self.elapsed_ms = 0.0
+        # sink that also receives every event, e.g. a PrintSink in 'Verbose' mode
+        self.echo = None
+
+    def timed(self, phase, function):
+        """Wraps function so the time spent in it is added to the phase."""
+        clock = time.perf_counter
+        seconds = self.seconds
+        calls = self.calls
+
+        def wrapper(*args, **kwargs):
+            started = clock()
+            result = function(*args, **kwargs)
+            seconds[phase] += clock() - started
+            calls[phase] += 1
+            return result
+
+        return wrapper
+
+    def selected(self, store, path, moves):
+        counters = self.counters
+        depth = len(moves)
+        counters['select_depth'] += depth
+        counters['max_select_depth'] = max(counters['max_select_depth'], depth)
+        terminal = bool(store.terminal[path[-1]])
+        counters['terminal_selections'] += terminal
+        if self.events is not None:
+            self.events.append(('select', list(moves), terminal))
+        if self.echo is not None:
+            self.echo.selected(store, path, moves)
+
+    def expanded(self, store, node, player, moves):
+        self.counters['expansions'] += 1
+        self.counters['children'] += len(moves)
+        if self.events is not None:
+            self.events.append(('expand', node, list(moves)))
+        if self.echo is not None:
+            self.echo.expanded(store, node, player, moves)
+
+    def rollout(self, moves, result):
+        self.counters['rollouts'] += 1
+        self.counters['rollout_moves'] += len(moves)
+        if self.events is not None:
+            self.events.append(('rollout', len(moves), result))
+        if self.echo is not None:
+            self.echo.rollout(moves, result)
+
+    def backpropagated(self, store, handles):
+        handles = list(handles)
+        self.counters['backprop_steps'] += len(handles)
+        if self.events is not None:
+            self.events.append(('backprop', len(handles)))
+        if self.echo is not None:
+            self.echo.backpropagated(store, handles)
+
+    def summary(self):
+        """Returns the profile as a JSON-serialisable dictionary."""
+        counters = self.counters
+        selections = self.calls['select']
+        phases = {}
+        for phase in self.PHASES:
+            calls = self.calls[phase]
+            phases[phase] = {'calls': calls, 'ms': self.seconds[phase] * 1000,
+                             'mean_us': self.seconds[phase] / calls * 1e6 if calls else 0.0}
+
+        summary = {
+            'iterations': self.iterations,
+            'elapsed_ms': self.elapsed_ms,
+            'phases': phases,
+            'counters': dict(counters),
+            'mean_select_depth': counters['select_depth'] / selections if selections else 0.0,
+            'mean_rollout_length': counters['rollout_moves'] / counters['rollouts'] if counters['rollouts'] else 0.0,
+        }
+        if self.events is not None:
+            summary['events'] = [list(event) for event in self.events]
+        return summary
@@ -1,8 +1,12 @@
 from algorithms import uniform_random_move
 from algorithms import pmcgs_move
 from algorithms import uct_move
+from algorithms import UCT_VARIATIONS
+from algorithms import EARLY_STOP_RULES
+from instrument import Profiler
 import connect_four as c4
 import argparse
+import json
 
 def extract_board(file_path):
     """extract the game contents from the game file"""
@@ -15,8 +19,12 @@ def extract_board(file_path):
 
 
 
-def best_move(game, algorithm=None, simulations=0, print_out='None'):
-    """input is a connect_four game board and the algorithm to use to determine the next best move"""
+def best_move(game, algorithm=None, simulations=0, print_out='None', pmcgs_options=None, uct_options=None):
+    """
+    input is a connect_four game board and the algorithm to use to determine the next best move;
+    pmcgs_options and uct_options are keyword arguments for pmcgs_move and uct_move
+    (e.g. rollouts_per_leaf, time_limit_ms, and for UCT variation, workers or solver_threshold)
+    """
 
     if algorithm == 'UR':
         # perform uniform random move
@@ -26,11 +34,11 @@ def best_move(game, algorithm=None, simulations=0, print_out='None'):
             move = uniform_random_move(game)
     elif algorithm == 'PMCGS':
         # perform a moved based on Pure Monte Carlo Game Search
-        move = pmcgs_move(game, simulations, print_out)
+        move = pmcgs_move(game, simulations, print_out, **(pmcgs_options or {}))
 
     elif algorithm == 'UCT':
         # perform a move based Upper Confidence bound for Trees
-        move = uct_move(game, simulations, print_out)
+        move = uct_move(game, simulations, print_out=print_out, **(uct_options or {}))
     else:
         print('No algorithm selected. Please select.')
 
@@ -50,7 +58,49 @@ def main():
     parser.add_argument('print_output', type=str, nargs='?', default="None",
                         choices=['Verbose', 'Brief', 'None'],
                         help='controls what the algorithm will print for output')
-    parser.add_argument('simulations', type=int, help='the number of simulations to run')
+    parser.add_argument('simulations', type=int,
+                        help='the number of simulations to run (0 with --time-limit or --max-nodes for no limit)')
+    parser.add_argument('--engine', type=str, default='list', choices=list(c4.ENGINES),
+                        help='board representation used by the game state')
+    parser.add_argument('--rollouts', type=int, default=1,
+                        help='random playouts per new node; more than one uses the NumPy batch simulator')
+    parser.add_argument('--transpositions', action='store_true',
+                        help='share statistics between move orders that reach the same position')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes running independent UCT searches whose root statistics are merged')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for reproducible searches')
+    parser.add_argument('--time-limit', type=float, default=None, dest='time_limit_ms',
+                        help='stop searching after this many milliseconds and return the best move so far')
+    parser.add_argument('--max-nodes', type=int, default=None,
+                        help='stop searching once the tree holds this many nodes')
+    parser.add_argument('--book', type=str, default=None,
+                        help='opening book file (see build_book.py) consulted before searching')
+    parser.add_argument('--solve-below', type=int, default=16, dest='solver_threshold',
+                        help='UCT solves positions with at most this many empty cells exactly (0 to always search)')
+    parser.add_argument('--no-mcts-solver', action='store_false', dest='mcts_solver',
+                        help='do not propagate proven wins and losses through the UCT tree')
+    parser.add_argument('--expansion', type=str, default='single', choices=['single', 'all'],
+                        help='add one new node per simulation, or every child of the selected node at once')
+    parser.add_argument('--rollout-policy', type=str, default='random', choices=['random', 'threat'],
+                        help='how rollouts pick moves: uniformly, or taking wins and blocking losses first')
+    parser.add_argument('--node-budget', type=int, default=None,
+                        help='UCT trees hold at most this many nodes; the search goes on when it is reached')
+    parser.add_argument('--memory-budget', type=float, default=None,
+                        help='UCT trees take at most this many megabytes; the search goes on when it is reached')
+    parser.add_argument('--on-full', type=str, default='evict', choices=['evict', 'freeze'],
+                        help='at the budget, prune the least-visited leaf subtrees or stop adding nodes')
+    parser.add_argument('--variation', type=str, default='None', choices=list(UCT_VARIATIONS),
+                        help='UCT selection rule; RAVE blends in all-moves-as-first statistics')
+    parser.add_argument('--rave-equivalence', type=int, default=1000,
+                        help='with --variation RAVE, visits at which a node trusts its own and the AMAF statistics equally')
+    parser.add_argument('--early-stop', type=str, default=None, choices=list(EARLY_STOP_RULES),
+                        help='UCT stops once no other move can overtake the best (margin) or it is clearly ahead (confidence)')
+    parser.add_argument('--symmetry', action='store_true',
+                        help='UCT treats mirror-image positions as one and searches only one of each mirrored pair of moves')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='write per-phase timings and counters of the search to this JSON file')
+    parser.add_argument('--trace', type=int, default=0,
+                        help='with --profile, also keep the last N search events in the file')
 
     # parse the arguments
     args = parser.parse_args()
@@ -59,7 +109,7 @@ def main():
     algorithm, current_player, board = extract_board(args.filepath)
 
     # create the board, load the current state, and display
-    game = c4.ConnectFour()
+    game = c4.new_game(args.engine)
     game.load_board(board, current_player)
 
 
@@ -69,8 +119,24 @@ def main():
         game.display_board()
 
 
+    profiler = Profiler(trace=args.trace) if args.profile else None
+
     # compute the next move based on the algorithm; print if option entered
-    best_move(game, algorithm, args.simulations, args.print_output)
+    # search options by keyword; PMCGS takes the shared ones, UCT all of them
+    search = {'rollouts_per_leaf': args.rollouts, 'transpositions': args.transpositions, 'seed': args.seed,
+              'time_limit_ms': args.time_limit_ms, 'max_nodes': args.max_nodes, 'profiler': profiler,
+              'book': args.book, 'expansion': args.expansion, 'rollout_policy': args.rollout_policy}
+    uct = dict(search, variation=args.variation, workers=args.workers, solver_threshold=args.solver_threshold,
+               mcts_solver=args.mcts_solver, node_budget=args.node_budget,
+               byte_budget=int(args.memory_budget * 1e6) if args.memory_budget is not None else None,
+               on_full=args.on_full, rave_equivalence=args.rave_equivalence, early_stop=args.early_stop,
+               symmetry=args.symmetry)
+    move = best_move(game, algorithm, args.simulations, args.print_output, pmcgs_options=search, uct_options=uct)
+
+    if profiler is not None:
+        summary = dict(profiler.summary(), algorithm=algorithm, move=move)
+        with open(args.profile, 'w') as file:
+            json.dump(summary, file, indent=2)
 
 
 
@@ -1,33 +1,207 @@
 import random
-import copy
-import connect_four
+from array import array
+
+from bitboard import WIDTH, mirror, is_mirrored
+
+PLAYERS = ('R', 'Y')  # players are stored as their index in this tuple
+
+# proven game-theoretic values, from the point of view of the player who moved into the node
+UNPROVEN = 0
+PROVEN_WIN = 1
+PROVEN_LOSS = -1
+PROVEN_DRAW = 2
+
+
+def terminal_status(state):
+    """Proven value of a position for the player who just moved: a win or a draw if the game is over."""
+    if not state.game_over:
+        return UNPROVEN
+    return PROVEN_WIN if state.winner else PROVEN_DRAW
+
+
+def canonical_moves(state):
+    """
+    Legal moves of a state as columns of the canonical orientation of its position (see
+    bitboard.canonical_key), and whether the state is the mirror image of that orientation.
+
+    In a position that is its own mirror image only the centre and the columns left of it are
+    kept: the other columns lead to the mirror images of the same positions.
+    """
+    key = state.key()
+    mirrored = mirror(key)
+    if mirrored == key:
+        return [move for move in state.valid_moves if move <= WIDTH // 2], False
+    if mirrored < key:
+        return [WIDTH - 1 - move for move in state.valid_moves], True
+    return list(state.valid_moves), False
+
+
+class NodeStore:
+    """
+    Struct-of-arrays storage for the nodes of a search tree.
+
+    A node is an integer handle indexing the per-node arrays. The children of node n are the
+    edges first_child[n] .. first_child[n] + child_count[n] - 1; each edge stores the move that
+    leads to the child and the child's handle, so a node shared through the transposition
+    table can be reached by a different move from each parent. A node expanded one child at a
+    time reserves an edge for each of its move_count[n] legal moves; the untried moves follow
+    the children in the block and have no child yet (-1).
+
+    In a tree folded by symmetry (see Tree) the moves of a node, on its edges and in move, are
+    columns of the canonical orientation of its position.
+    """
+
+    def __init__(self):
+        # per-node arrays
+        self.visits = array('i')  # Number of times the node has been visited
+        self.wins = array('i')  # Wins for the player who moved into the node
+        self.move = array('b')  # Move leading to the node from its first parent (-1 for the root)
+        self.parent = array('i')  # First parent of the node (-1 for the root)
+        self.first_child = array('i')  # Index of the node's first edge (-1 until expanded)
+        self.child_count = array('b')  # Number of children created so far
+        self.move_count = array('b')  # Number of legal moves, i.e. of edges reserved for the node
+        self.terminal = array('b')  # 1 for terminal nodes (win/loss/draw)
+        self.player = array('b')  # Index in PLAYERS of the player who moved into the node
+        self.proven = array('b')  # Proven value of the node (UNPROVEN, PROVEN_WIN, PROVEN_LOSS or PROVEN_DRAW)
+        # AMAF statistics of the 'RAVE' variation, None until track_amaf allocates them
+        self.amaf_visits = None  # Simulations through the parent in which the node's move was played
+        self.amaf_wins = None  # Those of them won by the player who moved into the node
+        # per-edge arrays
+        self.edge_move = array('b')  # Move played along the edge
+        self.edge_child = array('i')  # Node reached by the edge
+
+    def __len__(self):
+        return len(self.visits)
+
+    def add_node(self, move, parent, player, terminal, proven=UNPROVEN):
+        """Append a new unexpanded node and return its handle."""
+        self.visits.append(0)
+        self.wins.append(0)
+        self.move.append(move)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.move_count.append(0)
+        self.terminal.append(terminal)
+        self.player.append(player)
+        self.proven.append(proven)
+        if self.amaf_visits is not None:
+            self.amaf_visits.append(0)
+            self.amaf_wins.append(0)
+        return len(self.visits) - 1
+
+    def track_amaf(self):
+        """Allocate the AMAF arrays, zeroed for the existing nodes, unless they already are."""
+        if self.amaf_visits is None:
+            self.amaf_visits = array('i', [0]) * len(self)
+            self.amaf_wins = array('i', [0]) * len(self)
+
+    def copy_node(self, source, index, move, parent):
+        """Append a copy of another store's node (without its edges) and return its handle."""
+        handle = self.add_node(move, parent, source.player[index], source.terminal[index], source.proven[index])
+        self.visits[handle] = source.visits[index]
+        self.wins[handle] = source.wins[index]
+        if source.amaf_visits is not None:
+            self.track_amaf()
+            self.amaf_visits[handle] = source.amaf_visits[index]
+            self.amaf_wins[handle] = source.amaf_wins[index]
+        return handle
+
+    def nbytes(self):
+        """Memory used by the node and edge arrays, in bytes."""
+        arrays = (self.visits, self.wins, self.move, self.parent, self.first_child, self.child_count,
+                  self.move_count, self.terminal, self.player, self.proven, self.amaf_visits, self.amaf_wins,
+                  self.edge_move, self.edge_child)
+        return sum(len(values) * values.itemsize for values in arrays if values is not None)
 
 
 class Node:
-    def __init__(self, state, move=None, parent=None, player=None):
-        """
-        Initialize a node in the game tree.
+    """
+    Lightweight view of one node of a NodeStore.
 
+    Views are created on demand and compare equal when they refer to the same node; the
+    statistics themselves live in the store.
+    """
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        """
         Parameters:
-        - current_game: the game state at the current node
-        - move: The move that led to this node from its parent (None if this is the root).
-        - parent: The parent node (None if this is the root).
+        - store: NodeStore holding the node.
+        - index: handle of the node in the store.
         """
-        self.state = state # the game state at this node; a ConnectFour object
-        self.move = move  # The move leading to this node
-        self.parent = parent  # Parent node
-        self.children = []  # List of child nodes
-        self.wins = 0  # Wins for this node
-        self.visits = 0  # Number of times this node has been visited
-        self.is_terminal = False  # Flag for terminal nodes (win/loss/draw)
-        self.player = player  # player associated with this node
-        self.terminal_value = 0
-
-    def add_child(self, child_state, move, player):
-        """Create a new child node representing a move and add it to this node's children."""
-        child_node = Node(state=child_state, move=move, parent=self, player=player)
-        child_node.update_terminal_status()  # Check and update the terminal status for the child node
-        self.children.append(child_node)
+        self.store = store
+        self.index = index
+
+    @property
+    def move(self):
+        """The move that led to this node from its parent (None for the root)."""
+        move = self.store.move[self.index]
+        return None if move < 0 else move
+
+    @property
+    def parent(self):
+        """The parent node (None for the root). With transpositions this is the first parent."""
+        parent = self.store.parent[self.index]
+        return None if parent < 0 else Node(self.store, parent)
+
+    @property
+    def children(self):
+        """Child nodes, in the order of child_moves."""
+        first = self.store.first_child[self.index]
+        if first < 0:
+            return []
+        edges = self.store.edge_child[first:first + self.store.child_count[self.index]]
+        return [Node(self.store, child) for child in edges]
+
+    @property
+    def child_moves(self):
+        """Move leading to each child from this node."""
+        first = self.store.first_child[self.index]
+        if first < 0:
+            return []
+        return list(self.store.edge_move[first:first + self.store.child_count[self.index]])
+
+    @property
+    def wins(self):
+        return self.store.wins[self.index]
+
+    @property
+    def visits(self):
+        return self.store.visits[self.index]
+
+    @property
+    def is_terminal(self):
+        return bool(self.store.terminal[self.index])
+
+    @property
+    def player(self):
+        """The player who made the move leading to this node."""
+        return PLAYERS[self.store.player[self.index]]
+
+    @property
+    def proven(self):
+        """Proven value for the player who moved into the node (UNPROVEN if not known)."""
+        return self.store.proven[self.index]
+
+    @property
+    def proven_result(self):
+        """Result the node is proven to lead to (-1 Red wins, 0 draw, 1 Yellow wins), or None."""
+        proven = self.store.proven[self.index]
+        if proven == UNPROVEN:
+            return None
+        if proven == PROVEN_DRAW:
+            return 0
+        player = self.store.player[self.index]
+        winner = player if proven == PROVEN_WIN else 1 - player
+        return -1 if winner == 0 else 1
+
+    @property
+    def terminal_value(self):
+        """Value of a terminal node for printing purposes: -1 for Red, 1 for Yellow, 0 otherwise."""
+        if not self.is_terminal:
+            return 0
+        return -1 if self.player == 'R' else 1
 
     def update(self, result):
         """
@@ -36,104 +210,239 @@ class Node:
         Parameters:
         - result: -1 for a Red win, 0 for a draw, 1 for a Yellow win.
         """
-        self.visits += 1  # Always increment visits
+        store = self.store
+        store.visits[self.index] += 1  # Always increment visits
 
         if result == -1:  # Red wins
-            if self.player == 'R':  # If this node represents Red
-                self.wins += 1
+            if store.player[self.index] == 0:  # If this node represents Red
+                store.wins[self.index] += 1
         elif result == 1:  # Yellow wins
-            if self.player == 'Y':  # If this node represents Yellow
-                self.wins += 1
+            if store.player[self.index] == 1:  # If this node represents Yellow
+                store.wins[self.index] += 1
         # If it's a draw (result == 0), do nothing with wins, just increment visits
 
+    def update_counts(self, counts):
+        """
+        Update node statistics after a batch of simulations.
+
+        Parameters:
+        - counts: dictionary mapping each result (-1, 0, 1) to the number of simulations that ended with it.
+        """
+        store = self.store
+        store.visits[self.index] += sum(counts.values())
+        store.wins[self.index] += counts[-1] if store.player[self.index] == 0 else counts[1]
+
     def select_random_child(self):
         """Selects a random child node"""
-        return random.choice(self.children) if self.children else None
+        children = self.children
+        return random.choice(children) if children else None
 
     def get_move_sequence(self):
         """Retrieve the sequence of moves from the root to this node."""
         sequence = []
-        current_node = self
-        while current_node.parent is not None:
-            sequence.append(current_node.move)
-            current_node = current_node.parent
+        store = self.store
+        index = self.index
+        while store.parent[index] >= 0:
+            sequence.append(store.move[index])
+            index = store.parent[index]
         return sequence[::-1]  # Reverse to get sequence from root to this node
 
     def is_leaf(self):
         """Check if the node is a leaf, meaning it has no children."""
-        return len(self.children) == 0
+        return self.store.child_count[self.index] == 0
+
+    @property
+    def untried_moves(self):
+        """Legal moves that do not have a child yet (only a node expanded one child at a time has any)."""
+        store = self.store
+        first = store.first_child[self.index]
+        if first < 0:
+            return []
+        return list(store.edge_move[first + store.child_count[self.index]:first + store.move_count[self.index]])
 
     def is_fully_expanded(self):
         """Check if all possible moves from this node have been expanded."""
-        return len(self.children) > 0 and all(child.visits > 0 for child in self.children)
+        store = self.store
+        first = store.first_child[self.index]
+        if first < 0 or store.child_count[self.index] == 0:
+            return False
+        if store.child_count[self.index] < store.move_count[self.index]:
+            return False
+        visits = store.visits
+        return all(visits[child] > 0 for child in store.edge_child[first:first + store.child_count[self.index]])
 
-    def update_terminal_status(self):
-        """Check the state and update the terminal status."""
-        if self.state.game_over:  # checks if game is complete
-            self.is_terminal = True
+    def expand_node(self, state, table=None, sink=None, symmetry=False):
+        """
+        Add a child for every legal move.
 
-    def expand_node(self, print_out='None'):
-        # Make a deep copy of the current game state
-        game_copy = copy.deepcopy(self.state)  # Assuming self.state is an instance of ConnectFour
-        game_copy.update_game_status()
-        game_copy.update_valid_moves()
-        possible_moves = game_copy.valid_moves  # Get all legal moves
+        Parameters:
+        - state: the game state at this node; every move is made and undone, so it is left unchanged.
+        - table: optional transposition table mapping position keys to node handles. When the
+          position after a move is already in it, the existing node is linked instead of a new one.
+        - sink: optional trace sink told about the expansion.
+        - symmetry: store the moves as columns of the canonical orientation of the position, key
+          the table by canonical keys and, in a position that is its own mirror image, add only
+          one child for each mirrored pair of moves.
+        """
+        store = self.store
 
         # Get the next player
-        next_player = 'R' if game_copy.current_player == 'R' else 'Y'
+        next_player = state.current_player
+        player_index = PLAYERS.index(next_player)
+
+        moves = list(state.valid_moves)
+        mirrored = False
+        if symmetry:
+            moves, mirrored = canonical_moves(state)
+        first = len(store.edge_move)
 
         # Loop through each possible move
-        for move in possible_moves:
-            # Create a new child state by copying the current game state
-            child_state = copy.deepcopy(game_copy)  # Deep copy to ensure independence
-            child_state.make_move(move)  # Apply the move to the copied state
-            # Create a child node for this move
-            self.add_child(child_state, move, next_player)
+        for move in moves:
+            state.make_move(WIDTH - 1 - move if mirrored else move)  # Apply the move to the shared state
+
+            child = None
+            if table is not None:
+                key = state.canonical_key() if symmetry else state.key()
+                child = table.get(key)
+            if child is None:
+                # Create a child node for this move
+                child = store.add_node(move, self.index, player_index, state.game_over, terminal_status(state))
+                if table is not None:
+                    table[key] = child
+
+            state.undo_move()  # Restore the state for the next move
+            store.edge_move.append(move)
+            store.edge_child.append(child)
+
+        store.first_child[self.index] = first
+        store.child_count[self.index] = len(moves)
+        store.move_count[self.index] = len(moves)
 
-            if (print_out=='Verbose'):
-                print(f'NODE ADDED for {next_player} player for move {move}')
+        if sink is not None:
+            sink.expanded(store, self.index, next_player, [WIDTH - 1 - move for move in moves] if mirrored else moves)
 
-    def simulate_from_node(self, print_out='None'):
+    def expand_one(self, state, table=None, sink=None, symmetry=False):
         """
-        Perform a random simulation from the current node.
+        Add a child for one untried move, chosen at random.
+
+        On the first call the node reserves an edge for every legal move; each call then turns
+        one of them into a child.
+
+        Parameters:
+        - state: the game state at this node; the move is made and undone, so it is left unchanged.
+        - table: optional transposition table, as in expand_node.
+        - sink: optional trace sink told about the expansion.
+        - symmetry: fold mirrored positions and moves, as in expand_node.
 
         Returns:
-        - result: +1 for a win, 0 for a draw, -1 for a loss.
+        - The move, as a column of the state, and the new child, or None if every move already has a child.
         """
-        # Create a deep copy of the current state for simulation
-        current_state = copy.deepcopy(self.state)
+        store = self.store
+        index = self.index
+        next_player = state.current_player
 
-        # some helper print statements
-        # print(f'simulation for \'{self.player}\' into col {self.move}')
-        # print(current_state.display_board())
+        if store.first_child[index] < 0:
+            moves = canonical_moves(state)[0] if symmetry else state.valid_moves
+            store.first_child[index] = len(store.edge_move)
+            store.move_count[index] = len(moves)
+            store.edge_move.extend(moves)
+            store.edge_child.extend([-1] * len(moves))
 
-        while not current_state.game_over:  # Continue until the game is over
-            legal_moves = current_state.valid_moves  # Get all legal moves
-            # print(f'legal moves for {current_state.current_player}: {legal_moves}', end=' ')
-            move = random.choice(legal_moves)  # Select a random legal move
+        first = store.first_child[index]
+        count = store.child_count[index]
+        if count == store.move_count[index]:
+            return None
 
-            if(print_out=='Verbose'):
-                print(f'Move selected: {move}')
+        # move a random untried move to the front of the untried ones and give it a child
+        edge = first + count
+        pick = random.randrange(edge, first + store.move_count[index])
+        edge_move = store.edge_move
+        edge_move[edge], edge_move[pick] = edge_move[pick], edge_move[edge]
+        move = edge_move[edge]
+        column = move
+        if symmetry and is_mirrored(state.key()):
+            column = WIDTH - 1 - move  # the state is the mirror image of the node's orientation
 
-            current_state.make_move(move)  # Apply the selected move
+        state.make_move(column)
+        child = None
+        if table is not None:
+            key = state.canonical_key() if symmetry else state.key()
+            child = table.get(key)
+        if child is None:
+            child = store.add_node(move, index, PLAYERS.index(next_player), state.game_over, terminal_status(state))
+            if table is not None:
+                table[key] = child
+        state.undo_move()
+
+        store.edge_child[edge] = child
+        store.child_count[index] = count + 1
+
+        if sink is not None:
+            sink.expanded(store, index, next_player, [column])
+        return column, Node(store, child)
+
+    def simulate_from_node(self, state, sink=None, policy=None, moves=None):
+        """
+        Perform a random simulation from the current node.
+
+        Parameters:
+        - state: the game state at this node; the rollout is undone before returning.
+        - sink: optional trace sink told about the moves played and the result.
+        - policy: optional function choosing each rollout move from the state, or an object that
+          can also play a whole rollout with playout(state) (see rollout_policy); moves are
+          uniformly random without one.
+        - moves: optional list that receives the columns played in the rollout.
+
+        Returns:
+        - result: -1 for a Red win, 0 for a draw, 1 for a Yellow win.
+        """
+        moves_made = 0
+
+        if policy is None:
+            while not state.game_over:  # Continue until the game is over
+                legal_moves = state.valid_moves  # Get all legal moves
+                move = random.choice(legal_moves)  # Select a random legal move
+                state.make_move(move)  # Apply the selected move
+                moves_made += 1
+        elif hasattr(policy, 'playout'):
+            # the policy plays the game out by itself and leaves the state alone
+            result, played = policy.playout(state)
+            if sink is not None:
+                sink.rollout(played, result)
+            if moves is not None:
+                moves.extend(played)
+            return result
+        else:
+            while not state.game_over:
+                state.make_move(policy(state))
+                moves_made += 1
 
         # Return the result of the game from the perspective of the current player
-        if current_state.winner == 'R':
-            #if (print_out=='Verbose'):
-             #   print(f'Simulated winner: -1')
-            return -1  # Player 'R' wins
-        elif current_state.winner == 'Y':
-           #if (print_out=='Verbose'):
-             ##   print(f'Simulated winner: 1')
-            return 1  # Player 'Y' wins
-        elif current_state.draw:
-            #if (print_out=='Verbose'):
-            #    print(f'Simulated winner: 0')
-            return 0  # Draw
+        if state.winner == 'R':
+            result = -1  # Player 'R' wins
+        elif state.winner == 'Y':
+            result = 1  # Player 'Y' wins
+        elif state.draw:
+            result = 0  # Draw
         else:
-            return 2  # Unexpected result; should not reach here
+            result = 2  # Unexpected result; should not reach here
+
+        if sink is not None:
+            sink.rollout([entry[0] for entry in state.history[len(state.history) - moves_made:]], result)
+        if moves is not None:
+            moves.extend(entry[0] for entry in state.history[len(state.history) - moves_made:])
+
+        # Take the rollout back so the state is where the caller left it
+        for _ in range(moves_made):
+            state.undo_move()
+
+        return result
 
+    def __eq__(self, other):
+        return isinstance(other, Node) and other.store is self.store and other.index == self.index
 
+    def __hash__(self):
+        return hash((id(self.store), self.index))
 
     def __repr__(self):
         return f"Node(move={self.move}, wins={self.wins}, visits={self.visits})"
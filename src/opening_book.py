@@ -0,0 +1,110 @@
+import mmap
+import struct
+
+from bitboard import WIDTH, is_mirrored
+
+MAGIC = b'C4BK'
+VERSION = 1
+# magic, format version, deepest ply in the book, number of records
+HEADER = struct.Struct('<4sHHI')
+# position key, best move, its win rate for the player to move in thousandths
+RECORD = struct.Struct('<QBh')
+
+
+class OpeningBook:
+    """
+    Read-only opening book backed by a memory-mapped file.
+
+    The file is a header followed by fixed-size records sorted by position key, so a lookup is
+    a binary search that only touches the pages it needs; opening a book does not read it.
+    Positions are stored once for themselves and their mirror image, under the canonical key
+    (bitboard.canonical_key) and with the move as a column of the canonical orientation.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # mmap refuses empty files
+            self.file.close()
+            raise ValueError(f'{path} is not an opening book.')
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not an opening book.')
+
+        magic, version, self.max_ply, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not an opening book (version {VERSION}).')
+        if len(self.data) != HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError(f'{path} is truncated.')
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def lookup(self, key):
+        """Returns (move, value) stored for a position key, or None; value is the win rate for the player to move."""
+        data = self.data
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, move, value = RECORD.unpack_from(data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return move, value / 1000
+        return None
+
+    def entry(self, game):
+        """Returns (move, value) for the game's position, with the move as a column of the game, or None."""
+        key = game.key()
+        entry = self.lookup(game.canonical_key())
+        if entry is None or not is_mirrored(key):
+            return entry
+        move, value = entry
+        return WIDTH - 1 - move, value
+
+    def probe(self, game):
+        """Returns the book move for the game's position, or None if the position is not in the book."""
+        entry = self.entry(game)
+        return None if entry is None else entry[0]
+
+
+# books opened in this process, by path; a book is passed around as its path so that search
+# options stay picklable for worker processes
+_open_books = {}
+
+
+def open_book(book):
+    """Returns an OpeningBook for a path (opened once per process), or the book itself if one is given."""
+    if isinstance(book, OpeningBook):
+        return book
+    if book not in _open_books:
+        _open_books[book] = OpeningBook(book)
+    return _open_books[book]
+
+
+def book_move(game, book, print_out='None'):
+    """Looks the game's position up in a book (an OpeningBook or a path); returns the move or None."""
+    entry = open_book(book).entry(game)
+    if entry is None:
+        return None
+
+    move, value = entry
+    if (print_out == 'Verbose' or print_out == 'Brief'):
+        print(f'Book move: {move} (win rate {value:.2f})')
+    return move
@@ -0,0 +1,101 @@
+import random
+
+from bitboard import WIDTH, HEIGHT, STRIDE, BOTTOM_MASK, BOARD_MASK, winning_cells
+
+# relative weight of each column for the weighted random move; central columns take part in more lines
+CENTRE_WEIGHTS = (1, 2, 3, 4, 3, 2, 1)
+# every column repeated by its weight, so a uniform pick from it is a weighted pick of a column
+WEIGHTED_COLUMNS = [col for col, weight in enumerate(CENTRE_WEIGHTS) for _ in range(weight)]
+# bits of the playable cells of each column
+COLUMN_MASKS = [((1 << HEIGHT) - 1) << (col * STRIDE) for col in range(WIDTH)]
+
+
+def random_move(state):
+    """Uniformly random legal move (the default rollout policy)."""
+    return random.choice(state.valid_moves)
+
+
+def threat_move(state):
+    """
+    Threat-aware rollout move.
+
+    Takes an immediate win if there is one, otherwise blocks the opponent's immediate win, and
+    otherwise plays a random move weighted towards the centre.
+    """
+    player = state.current_player
+    wins = state.winning_moves(player)
+    if wins:
+        return wins[0]
+
+    blocks = state.winning_moves('Y' if player == 'R' else 'R')
+    if blocks:
+        return blocks[0]
+
+    # draw weighted columns until one can be played; cheaper than building weights for every move
+    moves = state.valid_moves
+    while True:
+        move = random.choice(WEIGHTED_COLUMNS)
+        if move in moves:
+            return move
+
+
+class ThreatPolicy:
+    """
+    The threat_move policy, with a whole-game playout for Node.simulate_from_node.
+
+    A policy object may define playout(state) -> (result, moves) to play a rollout by itself
+    without changing the state. This one plays on two local integers instead of the game
+    state: with the winning cells of both players known before every move, a move that does
+    not take a winning cell cannot win, so no other win test is needed.
+    """
+
+    def __call__(self, state):
+        return threat_move(state)
+
+    def playout(self, state):
+        """Plays the rest of the game; returns the result (-1 Red wins, 0 draw, 1 Yellow wins) and the moves."""
+        moves = []
+        if state.game_over:
+            return (-1 if state.winner == 'R' else 1 if state.winner == 'Y' else 0), moves
+
+        bitboards, _ = state.to_bitboards()
+        player = state.current_player
+        current = bitboards[player]
+        mask = bitboards['R'] | bitboards['Y']
+        choice = random.choice
+
+        while True:
+            possible = (mask + BOTTOM_MASK) & BOARD_MASK
+            if not possible:
+                return 0, moves
+
+            wins = winning_cells(current, mask) & possible
+            if wins:
+                moves.append(((wins & -wins).bit_length() - 1) // STRIDE)
+                return (-1 if player == 'R' else 1), moves
+
+            opponent = current ^ mask
+            blocks = winning_cells(opponent, mask) & possible
+            if blocks:
+                move = blocks & -blocks
+            else:
+                move = 0
+                while not move:
+                    move = possible & COLUMN_MASKS[choice(WEIGHTED_COLUMNS)]
+
+            moves.append((move.bit_length() - 1) // STRIDE)
+            current, mask = opponent, mask | move
+            player = 'Y' if player == 'R' else 'R'
+
+
+# rollout policies by name; a policy takes the game state and returns the move to play
+ROLLOUT_POLICIES = {'random': random_move, 'threat': ThreatPolicy()}
+
+
+def get_policy(policy):
+    """Returns the policy for a name from ROLLOUT_POLICIES, or the policy itself if one is given."""
+    if callable(policy):
+        return policy
+    if policy not in ROLLOUT_POLICIES:
+        raise ValueError(f"Unknown rollout policy: {policy}")
+    return ROLLOUT_POLICIES[policy]
@@ -0,0 +1,134 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from game_records import GameWriter, GameRecords, encode_record
+from tournament import Game, agent_options
+
+BLOCK_SIZE = 64
+
+
+def parse_agent(spec):
+    """Parses an 'ALGORITHM:VARIATION:SIMS' agent, e.g. 'UCT:None:50' or 'UR'."""
+    algorithm, variation, sims = (spec.split(':') + ['None', '0'])[:3]
+    if algorithm not in ('UR', 'PMCGS', 'UCT'):
+        raise ValueError(f'Unknown algorithm: {algorithm}')
+    return (algorithm, variation, int(sims))
+
+
+def pairings(roster):
+    """(red, yellow) agent ids played in turn: every ordered pair of agents, or one agent against itself."""
+    if len(roster) == 1:
+        return [(0, 0)]
+    return [(red, yellow) for red in range(len(roster)) for yellow in range(len(roster)) if red != yellow]
+
+
+def play_block(job):
+    """
+    Plays a block of consecutive games and returns (their encoded records, number of games); runs
+    in a worker process when the generator is parallel.
+    """
+    first, count, roster, engine, seed = job
+    matchups = pairings(roster)
+    records = []
+    for number in range(first, first + count):
+        red, yellow = matchups[number % len(matchups)]
+        # every game has its own seed, so the games do not depend on the blocks or workers
+        game_seed = random.Random(f'{seed}-{number}').getrandbits(32)
+        random.seed(game_seed)
+
+        red_agent, yellow_agent = roster[red], roster[yellow]
+        match = Game(red_agent[0], red_agent[1], red_agent[2], yellow_agent[0], yellow_agent[1], yellow_agent[2], 1,
+                     engine, True, agent_options(red_agent), agent_options(yellow_agent))
+        match.play()
+        records.append(encode_record(match.moves, match.result, red, yellow, game_seed))
+    return b''.join(records), count
+
+
+def generate_games(path, roster, num_games, engine='bitboard', workers=1, seed=0, block_size=BLOCK_SIZE,
+                   append=False, print_out='None'):
+    """
+    Plays self-play games and streams them to a game record file.
+
+    Parameters:
+    - path: record file to write.
+    - roster: agents as in tournament.py, (algorithm, variation, sims) with optional search options.
+    - num_games: number of games to play.
+    - workers: number of processes playing games at the same time.
+    - seed: base seed; game n always gets the same seed, so a run is reproducible.
+    - block_size: games a worker plays per job.
+    - append: add the games to an existing file of the same roster. They are numbered after the
+      games already in it, so appending with the same seed plays new games rather than repeats.
+
+    Only a few blocks per worker are in flight at once, so memory stays bounded for any number
+    of games.
+
+    Returns:
+    - The number of games written.
+    """
+    started = time.perf_counter()
+
+    with GameWriter(path, roster, append=append) as writer:
+        offset = writer.existing
+        jobs = ((offset + first, min(block_size, num_games - first), roster, engine, seed)
+                for first in range(0, num_games, block_size))
+
+        def record(block):
+            writer.write_encoded(*block)
+            if (print_out == 'Verbose'):
+                print(f'{writer.count}/{num_games} games written')
+
+        if workers > 1:
+            with ProcessPoolExecutor(workers) as executor:
+                pending = set()
+                for job in jobs:
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            record(future.result())
+                    pending.add(executor.submit(play_block, job))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+        else:
+            for job in jobs:
+                record(play_block(job))
+        count = writer.count
+
+    if (print_out == 'Verbose' or print_out == 'Brief'):
+        print(f'Wrote {count} games to {path} ({os.path.getsize(path)} bytes) '
+              f'in {time.perf_counter() - started:.1f} s')
+    return count
+
+
+def tally(path):
+    """Returns {(red, yellow): [red wins, draws, yellow wins, unfinished]} over a record file."""
+    columns = {-1: 0, 0: 1, 1: 2, None: 3}
+    scores = {}
+    with GameRecords(path) as records:
+        for red, yellow, result in records.results():
+            scores.setdefault((red, yellow), [0, 0, 0, 0])[columns[result]] += 1
+    return scores
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Connect Four self-play',
+                                     description='play many games between agents and store them as compact records')
+    parser.add_argument('output', type=str, help='game record file to write')
+    parser.add_argument('--games', type=int, default=1000, help='number of games to play')
+    parser.add_argument('--agent', type=parse_agent, action='append', default=None,
+                        help="agent as ALGORITHM:VARIATION:SIMS (repeat for several; default 'UCT:None:50')")
+    parser.add_argument('--engine', type=str, default='bitboard', help='board representation used by the games')
+    parser.add_argument('--workers', type=int, default=1, help='processes playing games at the same time')
+    parser.add_argument('--seed', type=int, default=0, help='base seed for the games')
+    parser.add_argument('--append', action='store_true', help='add to an existing record file')
+    args = parser.parse_args()
+
+    roster = args.agent or [('UCT', 'None', 50)]
+    generate_games(args.output, roster, args.games, args.engine, args.workers, args.seed, append=args.append,
+                   print_out='Brief')
+    for (red, yellow), (red_wins, draws, yellow_wins, _) in sorted(tally(args.output).items()):
+        print(f'{roster[red]} vs {roster[yellow]}: {red_wins} red wins, {draws} draws, {yellow_wins} yellow wins')
@@ -0,0 +1,414 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from collections import OrderedDict
+
+from algorithms import uct_move
+import connect_four as c4
+from session import SearchSession
+
+DEFAULT_PORT = 7474
+
+
+def build_game(request, engine):
+    """Game at a requested position: 'moves' played from the empty board, or a 'board' (six rows) and 'player'."""
+    game = c4.new_game(engine)
+    if 'board' in request:
+        game.load_board([list(row) for row in request['board']], request['player'])
+        return game
+    for col in request.get('moves', []):
+        if game.game_over or col not in game.valid_moves:
+            raise ValueError(f'Illegal move: {col}')
+        game.make_move(col)
+    return game
+
+
+def position_key(request):
+    """Key of a requested position in the tree caches."""
+    if 'board' in request:
+        return ('board', ''.join(request['board']), request['player'])
+    return tuple(request.get('moves', []))
+
+
+def cached_ancestor(keys, key):
+    """
+    Returns the cached key a position can continue from, or None.
+
+    A position given as moves continues the cached position with the longest list of moves it
+    starts with (possibly itself); a position given as a board only matches itself.
+    """
+    if key[:1] == ('board',):
+        return key if key in keys else None
+    for length in range(len(key), -1, -1):
+        if key[:length] in keys:
+            return key[:length]
+    return None
+
+
+def run_search(job, sessions, stop, engine, options):
+    """
+    Runs one search job in a worker process, continuing the cached tree of the position or of
+    an earlier position of the same game; returns the reply for the client.
+    """
+    game = build_game(job, engine)
+    if game.game_over:
+        raise ValueError('The game is already over.')
+
+    key = position_key(job)
+    ancestor = cached_ancestor(sessions, key)
+    session = sessions.pop(ancestor) if ancestor is not None else SearchSession(0, **options)
+    tree = session.sync(game)
+    reused = tree.root.visits
+
+    stats = {}
+    started = time.perf_counter()
+    move = uct_move(game, job.get('simulations'), job.get('variation', 'None'), tree=tree, stats=stats,
+                    stop=stop, time_limit_ms=job.get('time_limit_ms'), max_nodes=job.get('max_nodes'),
+                    **session.options)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    sessions[key] = session  # most recently used last
+
+    reply = {'move': move, 'columns': stats.get('columns', {}), 'simulations': stats.get('iterations', 0),
+             'reused_visits': reused, 'visits': tree.root.visits, 'elapsed_ms': elapsed_ms,
+             'stopped': stop.is_set()}
+    for name in ('proven_result', 'solved_result'):
+        if stats.get(name) is not None:
+            reply[name] = stats[name]
+    return reply
+
+
+def serve_searches(conn, stop, engine, cache_size, options):
+    """
+    Worker process loop: runs the jobs sent over conn one at a time until it receives None.
+
+    The trees of the last cache_size positions searched stay in memory, so a later job on the
+    same game continues from their statistics. A job that fails gets an 'error' reply.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the server shuts its workers down itself
+    sessions = OrderedDict()  # position key -> SearchSession, least recently used first
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        try:
+            reply = run_search(job, sessions, stop, engine, options)
+        except Exception as error:
+            # a failed search is answered like an illegal move; the worker and its other trees live on
+            reply = {'error': str(error) or type(error).__name__}
+        while len(sessions) > cache_size:
+            sessions.popitem(last=False)
+        reply['cached'] = list(sessions)
+        conn.send(reply)
+
+
+class Worker:
+    """A search process and what the server knows about it."""
+
+    def __init__(self, engine, cache_size, options):
+        self.conn, child = multiprocessing.Pipe()
+        self.stop = multiprocessing.Event()  # set to end the running search early
+        self.process = multiprocessing.Process(target=serve_searches, daemon=True,
+                                               args=(child, self.stop, engine, cache_size, options))
+        self.process.start()
+        self.lock = asyncio.Lock()  # one job at a time
+        self.keys = set()  # positions whose trees the worker holds
+        self.job = None  # (tag, op) of the running job
+        self.waiting = 0  # jobs running or queued
+
+    def close(self):
+        self.conn.send(None)
+        self.process.join()
+
+
+class AnalysisServer:
+    """
+    Local analysis server: searches positions in a pool of worker processes that stay warm
+    between requests.
+
+    Clients send JSON lines and get one JSON line back per request, with the request's 'id':
+    - {"op": "search", "id": 1, "moves": [3, 3], "simulations": 2000} searches a position given as
+      the moves played from the empty board (or as "board" rows and "player"), with an optional
+      "simulations", "time_limit_ms" or "max_nodes" budget and "variation". The reply has the move,
+      the value and visits of every column, the simulations run and the visits reused from
+      earlier searches.
+    - {"op": "ponder", "id": 2, "moves": [...]} searches until cancelled, until a search is sent
+      for the same worker, or until the ponder budget runs out; its reply is sent when it ends.
+    - {"op": "cancel", "id": 3, "target": 2} ends a running or queued request of the same client
+      early; the target still replies, with the best move found so far.
+
+    Every worker keeps the trees of its most recent positions; a request for a position reached
+    from one of them is sent to that worker and continues its statistics.
+    """
+
+    def __init__(self, workers=1, engine='bitboard', cache_size=8, simulations=1000, ponder_ms=60000, **options):
+        """
+        Parameters:
+        - workers: number of search processes.
+        - engine: board representation used by the searches.
+        - cache_size: number of search trees each worker keeps.
+        - simulations: budget of a search request that gives none.
+        - ponder_ms: longest a ponder request searches for.
+        - options: further keyword arguments for uct_move, fixed for every search (e.g. transpositions).
+        """
+        self.num_workers = workers
+        self.engine = engine
+        self.cache_size = cache_size
+        self.simulations = simulations
+        self.ponder_ms = ponder_ms
+        self.options = options
+        self.workers = []
+        self.pending = set()  # tags of the requests running or queued
+        self.cancelled = set()  # tags of queued requests cancelled before they started
+        self.connections = itertools.count()
+        self.server = None
+        self.path = None  # Unix socket, removed again on close
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        """Starts the workers and listens on a TCP port, or on a Unix socket if a path is given."""
+        self.workers = [Worker(self.engine, self.cache_size, self.options) for _ in range(self.num_workers)]
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_client, path)
+            self.path = path
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    def close(self):
+        """Stops listening and shuts the workers down."""
+        if self.server is not None:
+            self.server.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        for worker in self.workers:
+            worker.stop.set()
+            worker.close()
+        self.workers = []
+
+    async def handle_client(self, reader, writer):
+        """Reads the requests of one connection and answers each as soon as it is done."""
+        connection = next(self.connections)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(message):
+            async with write_lock:
+                writer.write((json.dumps(message) + '\n').encode())
+                await writer.drain()
+
+        async def answer(request):
+            try:
+                reply = await self.handle_request(request, connection)
+            except (ValueError, KeyError, TypeError) as error:
+                reply = {'error': str(error)}
+            reply['id'] = request.get('id')
+            await respond(reply)
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await respond({'error': 'Invalid JSON.'})
+                    continue
+                if not isinstance(request, dict):
+                    await respond({'error': 'A request must be a JSON object.'})
+                    continue
+                task = asyncio.ensure_future(answer(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            # a client that went away does not keep the workers busy
+            for tag in [tag for tag in self.pending if tag[0] == connection]:
+                self.cancel(tag)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def handle_request(self, request, connection):
+        """Returns the reply to one request."""
+        op = request.get('op', 'search')
+        if op in ('search', 'ponder'):
+            return await self.search(request, (connection, request.get('id')))
+        if op == 'cancel':
+            return {'cancelled': self.cancel((connection, request.get('target')))}
+        if op == 'status':
+            return {'workers': [{'cached': len(worker.keys), 'busy': worker.job is not None}
+                                for worker in self.workers]}
+        raise ValueError(f'Unknown op: {op}')
+
+    def choose_worker(self, key):
+        """The worker holding the tree the position continues, or else the least busy one."""
+        best = None
+        best_length = -1
+        for worker in self.workers:
+            ancestor = cached_ancestor(worker.keys, key)
+            if ancestor is not None and len(ancestor) > best_length:
+                best, best_length = worker, len(ancestor)
+        if best is not None:
+            return best
+        return min(self.workers, key=lambda worker: worker.waiting)
+
+    async def search(self, request, tag):
+        """Runs a search or ponder request on a worker and returns the worker's reply."""
+        job = dict(request)
+        if job.get('op') == 'ponder':
+            job['simulations'] = None
+            job.setdefault('time_limit_ms', self.ponder_ms)
+        elif all(job.get(name) is None for name in ('simulations', 'time_limit_ms', 'max_nodes')):
+            job['simulations'] = self.simulations
+
+        key = position_key(job)
+        worker = self.choose_worker(key)
+        if worker.job is not None and worker.job[1] == 'ponder':
+            worker.stop.set()  # a search preempts pondering; it continues the pondered tree
+
+        loop = asyncio.get_running_loop()
+        self.pending.add(tag)
+        worker.waiting += 1
+        try:
+            async with worker.lock:
+                if tag in self.cancelled:
+                    self.cancelled.discard(tag)
+                    return {'cancelled': True}
+                if job.get('op') == 'ponder' and worker.waiting > 1:
+                    return {'cancelled': True}  # pondering only uses an idle worker
+
+                worker.stop.clear()
+                worker.job = (tag, job.get('op', 'search'))
+                worker.keys.add(key)
+                worker.conn.send(job)
+                reply = await loop.run_in_executor(None, worker.conn.recv)
+                worker.keys = set(reply.pop('cached'))
+                worker.job = None
+                return reply
+        finally:
+            worker.waiting -= 1
+            self.pending.discard(tag)
+
+    def cancel(self, tag):
+        """Ends a running request early, or drops a queued one; returns whether the request was found."""
+        if tag not in self.pending:
+            return False
+        for worker in self.workers:
+            if worker.job is not None and worker.job[0] == tag:
+                worker.stop.set()
+                return True
+        self.cancelled.add(tag)
+        return True
+
+
+class AnalysisClient:
+    """
+    Blocking client for an AnalysisServer.
+
+    Several requests may be outstanding at once (e.g. a ponder and then a search); replies are
+    matched to their requests by id.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        if path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile('rw')
+        self.ids = itertools.count(1)
+        self.replies = {}  # replies received while waiting for another request
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def send(self, op, **fields):
+        """Sends a request and returns its id."""
+        request_id = next(self.ids)
+        self.file.write(json.dumps(dict(fields, op=op, id=request_id)) + '\n')
+        self.file.flush()
+        return request_id
+
+    def receive(self, request_id):
+        """Waits for the reply to a request."""
+        while request_id not in self.replies:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError('The analysis server closed the connection.')
+            reply = json.loads(line)
+            self.replies[reply.get('id')] = reply
+        return self.replies.pop(request_id)
+
+    def search(self, moves, **budget):
+        """Searches the position after moves and returns the reply; budget is simulations, time_limit_ms or max_nodes."""
+        return self.receive(self.send('search', moves=list(moves), **budget))
+
+    def ponder(self, moves, **budget):
+        """Starts pondering the position after moves; returns the request id to cancel or receive it."""
+        return self.send('ponder', moves=list(moves), **budget)
+
+    def cancel(self, request_id):
+        """Cancels a request; returns whether the server still had it."""
+        return self.receive(self.send('cancel', target=request_id))['cancelled']
+
+
+def main():
+    parser = argparse.ArgumentParser('Connect Four analysis server',
+                                     description='Serve searches from warm worker processes')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port to listen on')
+    parser.add_argument('--unix', type=str, default=None, help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=1, help='search processes')
+    parser.add_argument('--engine', type=str, default='bitboard', choices=list(c4.ENGINES),
+                        help='board representation used by the searches')
+    parser.add_argument('--cache', type=int, default=8, help='search trees kept by each worker')
+    parser.add_argument('--simulations', type=int, default=1000, help='budget of requests that give none')
+    parser.add_argument('--ponder-ms', type=float, default=60000, help='longest a ponder request searches for')
+    parser.add_argument('--transpositions', action='store_true',
+                        help='share statistics between move orders that reach the same position')
+    parser.add_argument('--book', type=str, default=None, help='opening book file consulted before searching')
+    parser.add_argument('--solve-below', type=int, default=16, dest='solver_threshold',
+                        help='solve positions with at most this many empty cells exactly (0 to always search)')
+    parser.add_argument('--no-mcts-solver', action='store_false', dest='mcts_solver',
+                        help='do not propagate proven wins and losses through the trees')
+    parser.add_argument('--expansion', type=str, default='single', choices=['single', 'all'],
+                        help='add one new node per simulation, or every child of the selected node at once')
+    parser.add_argument('--rollout-policy', type=str, default='random', choices=['random', 'threat'],
+                        help='how rollouts pick moves')
+    args = parser.parse_args()
+
+    server = AnalysisServer(args.workers, args.engine, args.cache, args.simulations, args.ponder_ms,
+                            transpositions=args.transpositions, book=args.book,
+                            solver_threshold=args.solver_threshold, mcts_solver=args.mcts_solver,
+                            expansion=args.expansion, rollout_policy=args.rollout_policy)
+
+    async def serve():
+        # serve until interrupted or terminated, then shut the workers down
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopping.set)
+
+        await server.start(args.host, args.port, args.unix)
+        print(f'Serving on {args.unix or f"{args.host}:{args.port}"} with {args.workers} workers', flush=True)
+        try:
+            await stopping.wait()
+        finally:
+            server.close()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
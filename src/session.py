@@ -0,0 +1,86 @@
+from algorithms import uct_move, run_simulations
+from solver import empty_cells
+from tree import Tree
+
+# options of uct_move that also apply to the simulations run while pondering
+PONDER_OPTIONS = ('rollouts_per_leaf', 'expansion', 'rollout_policy')
+
+
+class SearchSession:
+    """
+    Keeps one agent's UCT tree alive between its moves.
+
+    Before every search the root is advanced along the moves played since the last one (the
+    agent's own move and then the opponent's reply), so the statistics gathered under them
+    carry over and the sibling subtrees are discarded.
+    """
+
+    def __init__(self, num_simulations, variation='None', print_out='None', **options):
+        """
+        Parameters:
+        - num_simulations: Simulations run for every move.
+        - variation: UCT variation.
+        - options: further keyword arguments for uct_move, such as rollouts_per_leaf or transpositions.
+        """
+        self.num_simulations = num_simulations
+        self.variation = variation
+        self.print_out = print_out
+        self.options = options
+        self.tree = None  # created on the first search
+
+    def sync(self, game):
+        """Advance the tree to the game's position, or start a new tree if the game is not a continuation of it."""
+        if self.tree is not None:
+            self.tree.rewind()
+            known = self.tree.state.history
+            if game.history[:len(known)] == known:
+                for col, *_ in game.history[len(known):]:
+                    self.tree.advance(col)
+                return self.tree
+
+        self.tree = Tree(game, transpositions=self.options.get('transpositions', False),
+                         mcts_solver=self.options.get('mcts_solver', False),
+                         node_budget=self.options.get('node_budget'), byte_budget=self.options.get('byte_budget'),
+                         on_full=self.options.get('on_full', 'evict'),
+                         rave_equivalence=self.options.get('rave_equivalence', 1000),
+                         symmetry=self.options.get('symmetry', False))
+        return self.tree
+
+    def move(self, game, count_reused=False):
+        """
+        Continue the search from the game's position and return the best move.
+
+        With count_reused, the visits the tree already holds for the position (e.g. from pondering)
+        count against the simulation budget, and only the rest of it is searched.
+        """
+        tree = self.sync(game)
+        num_simulations = self.num_simulations
+        if count_reused:
+            num_simulations = max(0, num_simulations - tree.root.visits)
+        return uct_move(game, num_simulations, self.variation, self.print_out, tree=tree, **self.options)
+
+    def ponder(self, game, stop, num_simulations):
+        """
+        Search the game's position while the opponent is to move, until stop is set.
+
+        Meant to run in a background thread during the opponent's turn: the statistics gathered
+        under the opponent's reply are kept by the next call to move. The caller sets stop and
+        waits for the thread before touching the session again.
+
+        Parameters:
+        - game: the position, with the opponent to move; it must not change until the search stops.
+        - stop: threading.Event that ends the search.
+        - num_simulations: Most simulations to run, which bounds the size of the tree.
+
+        Returns:
+        - The number of simulations completed.
+        """
+        if game.game_over:
+            return 0
+        threshold = self.options.get('solver_threshold', 0)
+        if threshold and empty_cells(game) - 1 <= threshold:
+            return 0  # every reply is solved exactly; the tree would not be used
+        tree = self.sync(game)
+        options = {key: value for key, value in self.options.items() if key in PONDER_OPTIONS}
+        return run_simulations(tree, num_simulations, algorithm_type='UCT', variation=self.variation, stop=stop,
+                               **options)
@@ -0,0 +1,191 @@
+from array import array
+
+from bitboard import WIDTH, HEIGHT, STRIDE, BOTTOM_MASK, BOARD_MASK, has_four, winning_cells, mirror
+
+CELLS = WIDTH * HEIGHT
+# columns in the order they are tried: centre first, since central pieces take part in more lines
+COLUMN_ORDER = sorted(range(WIDTH), key=lambda col: abs(WIDTH // 2 - col))
+# lowest possible score; table entries store score - MIN_SCORE + 1 so that 0 means empty
+MIN_SCORE = -(CELLS // 2)
+TABLE_SIZE = (1 << 18) + 3
+
+
+def column_mask(col):
+    """Bits of the playable cells of a column."""
+    return ((1 << HEIGHT) - 1) << (col * STRIDE)
+
+
+class Solver:
+    """
+    Exact negamax alpha-beta solver for Connect Four positions.
+
+    Scores are from the point of view of the player to move: a win with the k-th last piece
+    that player still has scores k, a loss the negative of that, a draw 0, so faster wins
+    score higher. Positions are converted to bitboards (current player's pieces and the
+    occupancy mask) whatever engine the game uses.
+    """
+
+    def __init__(self, table_size=TABLE_SIZE):
+        """
+        Parameters:
+        - table_size: number of transposition table slots. The table never grows; a new entry
+          overwrites whatever was stored in its slot.
+        """
+        self.keys = array('Q', bytes(8 * table_size))
+        self.values = array('b', bytes(table_size))
+        self.table_size = table_size
+        self.nodes = 0  # positions searched since the solver was created
+
+    @staticmethod
+    def position(game):
+        """Returns (current player's pieces, occupancy mask, pieces played) for a game."""
+        bitboards, _ = game.to_bitboards()
+        mask = bitboards['R'] | bitboards['Y']
+        return bitboards[game.current_player], mask, bin(mask).count('1')
+
+    def negamax(self, current, mask, moves, alpha, beta):
+        """
+        Returns the score of a position within (alpha, beta), or a bound outside it.
+
+        The player to move must not be able to win at once; the callers check that, and every
+        move searched here blocks the opponent's immediate wins, which keeps it true below.
+        """
+        self.nodes += 1
+
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        # a cell the opponent would win on must be taken; two of them cannot both be
+        opponent = current ^ mask
+        opponent_wins = winning_cells(opponent, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return -((CELLS - moves) // 2)
+            possible = forced
+        # never play right below a cell the opponent would win on
+        possible &= ~(opponent_wins >> 1)
+        if not possible:
+            return -((CELLS - moves) // 2)
+
+        # nobody can win with two or fewer pieces left to play
+        if moves >= CELLS - 2:
+            return 0
+
+        # at best we win with our next-but-one piece, or with what the table says
+        upper = (CELLS - 1 - moves) // 2
+        key = current + mask + BOTTOM_MASK
+        slot = key % self.table_size
+        if self.keys[slot] == key and self.values[slot]:
+            upper = self.values[slot] + MIN_SCORE - 1
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        for next_current, next_mask in self.ordered_moves(current, mask, possible):
+            score = -self.negamax(next_current, next_mask, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        # every move failed low, so alpha is an upper bound on the score
+        self.keys[slot] = key
+        self.values[slot] = alpha - MIN_SCORE + 1
+        return alpha
+
+    @staticmethod
+    def ordered_moves(current, mask, possible):
+        """
+        Positions after each playable move, as (opponent's pieces, mask) for the opponent to move.
+
+        Moves that create the most new threats come first, centre columns first among equals.
+        """
+        children = []
+        for col in COLUMN_ORDER:
+            move = possible & column_mask(col)
+            if move:
+                mine = current | move
+                threats = bin(winning_cells(mine, mask | move)).count('1')
+                children.append((-threats, len(children), mine ^ (mask | move), mask | move))
+        children.sort()
+        return [(opponent, next_mask) for _, _, opponent, next_mask in children]
+
+    def solve(self, game):
+        """
+        Returns the exact score of the game's position for the player to move.
+
+        The window is narrowed with null-window searches, trying the scores of the quickest wins
+        and losses first; each probe refines the transposition table for the next, so the
+        search deepens gradually instead of searching the full window at once.
+        """
+        if game.game_over:
+            raise ValueError("The game is already over.")
+        current, mask, moves = self.position(game)
+        return self.solve_position(current, mask, moves)
+
+    def solve_position(self, current, mask, moves):
+        """Exact score of a position given as bitboards (see solve)."""
+        if winning_cells(current, mask) & (mask + BOTTOM_MASK) & BOARD_MASK:
+            return (CELLS + 1 - moves) // 2
+
+        low = -((CELLS - moves) // 2)
+        high = (CELLS + 1 - moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and int(high / 2) > middle:
+                middle = int(high / 2)
+            score = self.negamax(current, mask, moves, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def analyze(self, game):
+        """Returns the exact score of every legal move for the player to move."""
+        if game.game_over:
+            raise ValueError("The game is already over.")
+        current, mask, moves = self.position(game)
+        # in a position that is its own mirror image, mirrored moves have the same score
+        symmetric = mirror(mask) == mask and mirror(current) == current
+
+        scores = {}
+        for col in game.valid_moves:
+            if symmetric and WIDTH - 1 - col in scores:
+                scores[col] = scores[WIDTH - 1 - col]
+                continue
+            move = (mask + (1 << (col * STRIDE))) & column_mask(col)
+            mine = current | move
+            if has_four(mine):
+                scores[col] = (CELLS + 1 - moves) // 2
+            elif moves + 1 == CELLS:
+                scores[col] = 0
+            else:
+                scores[col] = -self.solve_position(mine ^ (mask | move), mask | move, moves + 1)
+        return scores
+
+    def best_move(self, game):
+        """Returns (move, score) of the best move; the centre-most move wins ties."""
+        return best_scored_move(self.analyze(game))
+
+
+def best_scored_move(scores):
+    """Returns (move, score) of the highest scoring move from Solver.analyze; the centre-most move wins ties."""
+    move = max(scores, key=lambda col: (scores[col], -COLUMN_ORDER.index(col)))
+    return move, scores[move]
+
+
+def empty_cells(game):
+    """Number of empty cells left on the board."""
+    bitboards, _ = game.to_bitboards()
+    return CELLS - bin(bitboards['R'] | bitboards['Y']).count('1')
+
+
+def score_result(score, player):
+    """Converts a score for player into a result: -1 for a Red win, 0 for a draw, 1 for a Yellow win."""
+    if score == 0:
+        return 0
+    winner = player if score > 0 else ('Y' if player == 'R' else 'R')
+    return -1 if winner == 'R' else 1
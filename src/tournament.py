@@ -1,15 +1,24 @@
 import random
 import math
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from algorithms import uniform_random_move
 from algorithms import pmcgs_move
 from algorithms import uct_move
-from connect_four import ConnectFour
+from algorithms import EARLY_STOP_RULES
+from connect_four import new_game
 from node import Node
 from tree import Tree
+from session import SearchSession
 
 
-def best_move(game, algorithm=None, variation='None', simulations=0, print_out='None'):
-    """input is a connect_four game board and the algorithm to use to determine the next best move"""
+def best_move(game, algorithm=None, variation='None', simulations=0, print_out='None', **options):
+    """
+    input is a connect_four game board and the algorithm to use to determine the next best move;
+    options are passed on to the search (e.g. workers, seed, rollouts_per_leaf, transpositions)
+    """
 
     if algorithm == 'UR':
         # perform uniform random move
@@ -19,10 +28,10 @@ def best_move(game, algorithm=None, variation='None', simulations=0, print_out='
             move = uniform_random_move(game)
     elif algorithm == 'PMCGS':
         # perform a moved based on Pure Monte Carlo Game Search
-        move = pmcgs_move(game, simulations, print_out)
+        move = pmcgs_move(game, simulations, print_out, **options)
     elif algorithm == 'UCT':
         # perform a move based Upper Confidence bound for Trees
-        move = uct_move(game, simulations, variation, print_out)
+        move = uct_move(game, simulations, variation, print_out, **options)
     else:
         print('No algorithm selected. Please select.')
 
@@ -32,27 +41,45 @@ def best_move(game, algorithm=None, variation='None', simulations=0, print_out='
 class Game:
     """models a game between two agents"""
 
-    def __init__(self, agent1_algorithm, agent1_variation, agent1_sims, agent2_algorithm, agent2_variation, agent2_sims, num_games):
+    def __init__(self, agent1_algorithm, agent1_variation, agent1_sims, agent2_algorithm, agent2_variation, agent2_sims, num_games, engine='list', reuse_trees=True,
+                 agent1_options=None, agent2_options=None):
         self.agent1_algorithm = agent1_algorithm
         self.agent2_algorithm = agent2_algorithm
         self.agent1_variation = agent1_variation
         self.agent2_variation = agent2_variation
         self.agent1_sims = agent1_sims
         self.agent2_sims = agent2_sims
+        self.agent1_options = agent1_options or {}  # extra search options, e.g. {'workers': 4}
+        self.agent2_options = agent2_options or {}
         self.num_games = num_games
+        self.engine = engine
+        self.reuse_trees = reuse_trees  # keep each UCT agent's tree between its moves
         self.agent1_wins = 0
         self.agent2_wins = 0
         self.draws = 0
+        self.moves = []  # columns played in the last game
+        self.result = None  # result of the last game: -1 Red wins, 0 draw, 1 Yellow wins, None if unfinished
 
     def play(self):
         """plays a single game between two agents"""
-        game = ConnectFour()  # Start a new game instance
+        game = new_game(self.engine)  # Start a new game instance
+
+        # UCT agents keep their search tree for the whole game when tree reuse is on;
+        # root-parallel agents build new trees in their workers every move
+        sessions = {}
+        if self.reuse_trees:
+            if self.agent1_algorithm == 'UCT' and self.agent1_options.get('workers', 1) <= 1:
+                sessions['R'] = SearchSession(self.agent1_sims, self.agent1_variation, **self.agent1_options)
+            if self.agent2_algorithm == 'UCT' and self.agent2_options.get('workers', 1) <= 1:
+                sessions['Y'] = SearchSession(self.agent2_sims, self.agent2_variation, **self.agent2_options)
 
         while not game.game_over:
-            if game.current_player == 'R':
-                move = best_move(game, algorithm=self.agent1_algorithm, variation=self.agent1_variation, simulations=self.agent1_sims, print_out='None')
+            if game.current_player in sessions:
+                move = sessions[game.current_player].move(game)
+            elif game.current_player == 'R':
+                move = best_move(game, algorithm=self.agent1_algorithm, variation=self.agent1_variation, simulations=self.agent1_sims, print_out='None', **self.agent1_options)
             else:
-                move = best_move(game, algorithm=self.agent2_algorithm, variation=self.agent2_variation, simulations=self.agent2_sims, print_out='None')
+                move = best_move(game, algorithm=self.agent2_algorithm, variation=self.agent2_variation, simulations=self.agent2_sims, print_out='None', **self.agent2_options)
 
             if move is not None:
                 game.make_move(move)  # Apply the selected move
@@ -61,46 +88,176 @@ class Game:
                 break
 
         # Record the result of the game
+        self.moves = [col for col, *_ in game.history]
         if game.winner == 'R':
             self.agent1_wins += 1
+            self.result = -1
         elif game.winner == 'Y':
             self.agent2_wins += 1
+            self.result = 1
         else:
             self.draws += 1
+            self.result = 0 if game.game_over else None
+
+
+# predefined rosters for the command line
+ROSTERS = {
+    'variations': [('UCT', 'None', 100), ('UCT', 'Exploitation', 100), ('UCT', 'Exploration', 100),
+                   ('UCT', 'Heuristic', 100)],
+    # threat-aware rollouts with a quarter of the simulations against uniformly random ones
+    'rollouts': [('UCT', 'None', 400), ('UCT', 'None', 100, {'rollout_policy': 'threat'}),
+                 ('UCT', 'None', 400, {'rollout_policy': 'threat'})],
+    # RAVE with half the simulations against plain UCT
+    'rave': [('UCT', 'None', 400), ('UCT', 'RAVE', 200), ('UCT', 'RAVE', 400)],
+    # symmetry folding with half the simulations against plain UCT
+    'symmetry': [('UCT', 'None', 400), ('UCT', 'None', 200, {'symmetry': True}),
+                 ('UCT', 'None', 400, {'symmetry': True})],
+}
+
+
+def play_tournament_game(job):
+    """
+    plays one game of a tournament and returns its record; runs in a worker process when the
+    tournament is parallel, so everything it needs comes in the job tuple
+    """
+    pairing, game_number, red, yellow, engine, reuse_trees, seed = job
+    red_number, red_agent = red
+    yellow_number, yellow_agent = yellow
+
+    random.seed(seed)  # every game has its own seed, so results do not depend on which worker plays it
+
+    match = Game(red_agent[0], red_agent[1], red_agent[2], yellow_agent[0], yellow_agent[1], yellow_agent[2], 1, engine, reuse_trees,
+                 agent_options(red_agent), agent_options(yellow_agent))
+    match.play()
+
+    if match.agent1_wins:
+        winner = red_number
+    elif match.agent2_wins:
+        winner = yellow_number
+    else:
+        winner = None
+
+    return {'pairing': list(pairing), 'game': game_number, 'red': red_number, 'winner': winner}
+
+
+def agent_options(agent):
+    """extra search options of a roster entry (the optional fourth element)"""
+    return agent[3] if len(agent) > 3 else {}
 
 
 class Tournament:
-    def __init__(self, agents, num_games):
-        """takes in a dictionary of the different algorithms, roster is a tuple of (algorithm, sims)"""
+    def __init__(self, agents, num_games, engine='list', reuse_trees=True, seed=0):
+        """
+        takes in a dictionary of the different algorithms, roster is a tuple of (algorithm, variation, sims)
+        with an optional fourth element holding extra search options, e.g. ('UCT', 'None', 100, {'workers': 4})
+        """
 
         self.roster = agents
         self.matches = num_games
+        self.engine = engine
+        self.reuse_trees = reuse_trees
+        self.seed = seed  # base seed from which every game's seed is derived
         self.results = {}
 
 
-    def run(self):
-        """runs the tournament"""
-
-        # roster = [('UCT', 'None', 100), ('UCT', 'Exploitation', 100), ('UCT', 'Exploration', 100), ('UCT', 'Heuristic', 100)]
-
+    def jobs(self):
+        """
+        lists every game of the round-robin; colours alternate within a pairing so each agent
+        plays Red in half of the games
+        """
+        jobs = []
         for i in range(len(self.roster) - 1):
             for j in range(i+1, len(self.roster)):
-                agent1_algorithm = self.roster[i][0]
-                agent2_algorithm = self.roster[j][0]
+                pairing = (i+1, j+1)
+                for game_number in range(self.matches):
+                    agent1 = (i+1, self.roster[i])
+                    agent2 = (j+1, self.roster[j])
+                    red, yellow = (agent1, agent2) if game_number % 2 == 0 else (agent2, agent1)
+                    seed = random.Random(f'{self.seed}-{i+1}-{j+1}-{game_number}').getrandbits(32)
+                    jobs.append((pairing, game_number, red, yellow, self.engine, self.reuse_trees, seed))
+        return jobs
+
+    def header(self):
+        """first line of the results file; identifies the tournament so a resume cannot mix up two of them"""
+        return {'roster': [repr(agent) for agent in self.roster], 'num_games': self.matches,
+                'engine': self.engine, 'reuse_trees': self.reuse_trees, 'seed': self.seed}
+
+    def load_records(self, results_path):
+        """reads the records already in the results file, dropping a line left half-written by an interruption"""
+        if not os.path.exists(results_path):
+            return []
+
+        with open(results_path, 'r') as file:
+            content = file.read()
+
+        complete, _, partial = content.rpartition('\n')
+        if partial:
+            # the last write was cut off; truncate the file back to the last complete line
+            with open(results_path, 'w') as file:
+                file.write(complete + '\n' if complete else '')
+
+        lines = [json.loads(line) for line in complete.split('\n') if line]
+        if not lines:
+            return []
+        if lines[0] != self.header():
+            raise ValueError(f'{results_path} holds the results of a different tournament.')
+        # only game records count; a header repeated by an older interrupted run is skipped
+        return [line for line in lines[1:] if 'pairing' in line]
+
+    def run(self, workers=1, results_path=None):
+        """
+        runs the tournament
+
+        Parameters:
+        - workers: number of processes playing games at the same time
+        - results_path: optional file that every finished game is appended to as a JSON line; running
+          again with the same file resumes the tournament and only plays the missing games
+        """
 
-                agent1_variation = self.roster[i][1]
-                agent2_variation = self.roster[j][1]
-
-                agent1_sims = self.roster[i][2]
-                agent2_sims = self.roster[j][2]
+        # roster = [('UCT', 'None', 100), ('UCT', 'Exploitation', 100), ('UCT', 'Exploration', 100), ('UCT', 'Heuristic', 100)]
 
-                match = Game(agent1_algorithm, agent1_variation, agent1_sims, agent2_algorithm, agent2_variation, agent2_sims, self.matches)
-                for _ in range(match.num_games):
-                    match.play()
+        records = self.load_records(results_path) if results_path else []
+        done = {(tuple(record['pairing']), record['game']) for record in records}
+        pending = [job for job in self.jobs() if (job[0], job[1]) not in done]
+
+        results_file = None
+        if results_path:
+            # the header is written once, when the file is new; a run interrupted before its first game
+            # leaves just the header, which the resume keeps
+            new_file = not os.path.exists(results_path) or os.path.getsize(results_path) == 0
+            results_file = open(results_path, 'a')
+            if new_file:
+                results_file.write(json.dumps(self.header()) + '\n')
+
+        def record_game(record):
+            records.append(record)
+            if results_file:
+                results_file.write(json.dumps(record) + '\n')
+                results_file.flush()  # each finished game is on disk before the next one is reported
+
+        try:
+            if workers > 1:
+                with ProcessPoolExecutor(workers) as executor:
+                    futures = [executor.submit(play_tournament_game, job) for job in pending]
+                    for future in as_completed(futures):
+                        record_game(future.result())
+            else:
+                for job in pending:
+                    record_game(play_tournament_game(job))
+        finally:
+            if results_file:
+                results_file.close()
 
-                win_percentage = match.agent1_wins / match.num_games
+        self.results = self.tally(records)
 
-                self.results[(i+1, j+1)] = win_percentage
+    def tally(self, records):
+        """win percentage of the first agent of every pairing; independent of the order games finished in"""
+        results = {}
+        for i in range(len(self.roster) - 1):
+            for j in range(i+1, len(self.roster)):
+                wins = sum(1 for record in records if tuple(record['pairing']) == (i+1, j+1) and record['winner'] == i+1)
+                results[(i+1, j+1)] = wins / self.matches
+        return results
 
 
     def display_results(self):
@@ -118,10 +275,24 @@ class Tournament:
 
 if __name__ == '__main__':
 
-    agents = [('UCT', 'None', 100), ('UCT', 'Exploitation', 100), ('UCT', 'Exploration', 100), ('UCT', 'Heuristic', 100)]
-
-    tournament = Tournament(agents, 20)
-    tournament.run()
+    parser = argparse.ArgumentParser('Connect Four tournament', description='round-robin between agents')
+    parser.add_argument('--workers', type=int, default=1, help='number of games played at the same time')
+    parser.add_argument('--results', type=str, default=None,
+                        help='append finished games to this file; rerun with the same file to resume')
+    parser.add_argument('--seed', type=int, default=0, help='base seed for the games')
+    parser.add_argument('--roster', type=str, default='variations', choices=list(ROSTERS),
+                        help='agents to play: the UCT variations, or plain UCT against threat-aware rollouts, '
+                             'RAVE or symmetry folding')
+    parser.add_argument('--games', type=int, default=20, help='games per pairing')
+    parser.add_argument('--early-stop', type=str, default=None, choices=list(EARLY_STOP_RULES),
+                        help='UCT agents stop searching once their best move is settled by this rule')
+    args = parser.parse_args()
+
+    agents = ROSTERS[args.roster]
+    if args.early_stop is not None:
+        agents = [agent[:3] + (dict(agent_options(agent), early_stop=args.early_stop),) if agent[0] == 'UCT' else agent
+                  for agent in agents]
+
+    tournament = Tournament(agents, args.games, seed=args.seed)
+    tournament.run(workers=args.workers, results_path=args.results)
     tournament.display_results()
-
-
@@ -1,113 +1,612 @@
 # tree.py
-import copy
-import connect_four
+import sys
+from array import array
+from collections import deque
 
-from node import Node
+from bitboard import WIDTH, is_mirrored, is_symmetric
+from node import Node, NodeStore, PLAYERS, UNPROVEN, PROVEN_WIN, PROVEN_LOSS, PROVEN_DRAW, terminal_status
 import random
 import math
 
+# center control heuristic of the 'Heuristic' UCT variation: a bonus for the center columns
+CENTER_BONUS = (0, 0, 1, 1, 1, 0, 0)
+# visit counts whose logarithms are looked up instead of computed; above it, only nodes near the
+# root, a handful per selection, call math.log
+LOG_CACHE_SIZE = 1 << 12
+# LOG_VISITS[n] is log(n), built once and shared by every tree; index 0 is unused
+LOG_VISITS = array('d', [0.0]) + array('d', map(math.log, range(1, LOG_CACHE_SIZE)))
+
 
 class Tree:
-    def __init__(self, root_state):
+    # selection function and exploration constant of every UCT variation
+    UCT_VARIATIONS = {'None': ('_ucb_select', 1.4), 'Exploitation': ('_ucb_select', 0),
+                      'Exploration': ('_ucb_select', 2.5), 'Heuristic': ('_ucb_select_heuristic', 1.4),
+                      'RAVE': ('_rave_select', 0.7)}
+    # share of the budget a tree is pruned down to when it reaches the budget
+    EVICT_FRACTION = 0.75
+    BUDGET_POLICIES = ('evict', 'freeze')
+
+    def __init__(self, root_state, transpositions=False, mcts_solver=False, node_budget=None, byte_budget=None,
+                 on_full='evict', rave_equivalence=1000, symmetry=False):
         """
         Initialize the game tree with a root node.
 
         Parameters:
         - root_state: The initial state of the game at the root of the tree.
+        - transpositions: share one node between all move orders that reach the same position,
+          which turns the tree into a directed acyclic graph.
+        - mcts_solver: propagate proven wins, losses and draws from terminal nodes up the tree
+          during backpropagation (MCTS-Solver). Proven nodes are not simulated again and moves
+          proven to lose are no longer selected.
+        - node_budget: most nodes the tree may hold (None for no limit).
+        - byte_budget: most bytes the node arrays and transposition table may take (None for no limit).
+        - on_full: what happens when a budget is reached: 'evict' prunes the subtrees of the
+          least-visited nodes whose children are all leaves, 'freeze' stops adding nodes, and
+          the search keeps refining the statistics of the existing ones.
+        - rave_equivalence: for the 'RAVE' variation, the number of visits of a node at which its
+          own statistics and the AMAF statistics of its children are weighted about equally; the
+          AMAF weight fades as the node gets more visits.
+        - symmetry: treat a position and its mirror image as one. Every node keeps its moves as
+          columns of the canonical orientation of its position (bitboard.canonical_key), the
+          transposition table is keyed by canonical keys so mirror-image positions share a node,
+          and a position that is its own mirror image gets one child per mirrored pair of moves.
         """
+        if on_full not in self.BUDGET_POLICIES:
+            raise ValueError(f"Unknown budget policy: {on_full}")
+
         # Get the player who just moved
         prior_player = 'Y' if root_state.current_player == 'R' else 'R'
 
-        self.root = Node(root_state, player=prior_player)  # Root node of the tree
-        self.current_node = self.root # keeps track of tree traversal
+        # all nodes live in the store; the tree works with their integer handles
+        self.store = NodeStore()
+        self.root_index = self.store.add_node(-1, -1, PLAYERS.index(prior_player), False)
+        # scratch copy of the root state; selection replays moves on it and rewinds afterwards
+        self.state = root_state.copy()
+        self.root_depth = len(self.state.history)
+        self.symmetry = symmetry
+        # whether the root position is the mirror image of the orientation its moves are kept in
+        self.root_mirrored = symmetry and is_mirrored(self.state.key())
+        # position key -> node handle, consulted when nodes are expanded
+        self.table = {self._key(): self.root_index} if transpositions else None
+        # handles of the nodes visited by the last selection, from the root down;
+        # results are backpropagated along it
+        self.path = [self.root_index]
+        self.mcts_solver = mcts_solver
+        self.node_budget = node_budget
+        self.byte_budget = byte_budget
+        self.on_full = on_full
+        self.evicted = 0  # nodes removed to stay within the budget
+        self.rave_equivalence = rave_equivalence
+        self._evicted_at = None  # tree size after the last eviction, which could not get under the budget
+
+    @property
+    def root(self):
+        """Root node of the tree."""
+        return Node(self.store, self.root_index)
+
+    def _key(self):
+        """Transposition table key of the scratch state's position."""
+        return self.state.canonical_key() if self.symmetry else self.state.key()
+
+    def root_moves(self):
+        """Moves of the root's children, in the order of root.children, as columns of the root position."""
+        moves = self.root.child_moves
+        if self.root_mirrored:
+            return [WIDTH - 1 - move for move in moves]
+        return moves
 
-    def select(self, algorithm_type='PMCGS', variation='None', print_out='None'):
-        """Select a node to expand based on the given algorithm."""
-        current_node = self.root
+    def rewind(self):
+        """Undo moves on the scratch state until it is back at the root position."""
+        while len(self.state.history) > self.root_depth:
+            self.state.undo_move()
 
-        while not current_node.is_terminal:
-            if not current_node.is_fully_expanded():
+    @property
+    def bounded(self):
+        """Whether the tree has a node or byte budget."""
+        return self.node_budget is not None or self.byte_budget is not None
+
+    def nbytes(self):
+        """Memory used by the node arrays and the transposition table, in bytes."""
+        size = self.store.nbytes()
+        if self.table is not None:
+            size += sys.getsizeof(self.table)
+        return size
+
+    def over_budget(self):
+        """Whether the tree has reached its node or byte budget."""
+        if self.node_budget is not None and len(self.store) >= self.node_budget:
+            return True
+        return self.byte_budget is not None and self.nbytes() >= self.byte_budget
+
+    def has_room(self):
+        """
+        Whether new nodes may be added. With the 'evict' policy a tree that reached its budget is
+        pruned first; it refuses new nodes only if pruning cannot get it under the budget.
+        """
+        if not self.over_budget():
+            return True
+        if self.on_full != 'evict' or self._evicted_at == len(self.store):
+            return False
+        self.evict()
+        if self.over_budget():
+            self._evicted_at = len(self.store)  # do not try again until the tree has changed
+            return False
+        return True
+
+    def evict(self):
+        """
+        Prune the tree to EVICT_FRACTION of its budget; returns the number of nodes removed.
+
+        Nodes whose children are all leaves are collapsed back into leaves, least visited first;
+        they keep their own statistics, so a later search can expand them again. Proven nodes
+        are kept whole: a proof is never searched again, so a collapsed one would have no moves.
+        The removed nodes are then dropped by copying the rest of the tree into a fresh store.
+        """
+        self.rewind()
+        store = self.store
+        before = len(store)
+        target = before * self.EVICT_FRACTION
+        if self.node_budget is not None:
+            target = min(target, self.node_budget * self.EVICT_FRACTION)
+        if self.byte_budget is not None:
+            target = min(target, before * self.byte_budget * self.EVICT_FRACTION / self.nbytes())
+
+        first_child = store.first_child
+        child_count = store.child_count
+        edge_child = store.edge_child
+        proven = store.proven
+        excess = before - target
+        while excess > 0:
+            # every node below the root whose children are all unexpanded, least visited first
+            candidates = []
+            for node in range(before):
+                first = first_child[node]
+                count = child_count[node]
+                if first < 0 or count == 0 or node == self.root_index or proven[node]:
+                    continue
+                if all(first_child[child] < 0 for child in edge_child[first:first + count]):
+                    candidates.append((store.visits[node], node))
+            if not candidates:
                 break
+            candidates.sort()
 
-            # select the proper UCT variation
-            if algorithm_type == 'UCT':
-                if variation == 'None':
-                    current_node = self._ucb_select(current_node)
-                elif variation == 'Exploitation':
-                    current_node = self._ucb_select(current_node, c=0)
-                elif variation == 'Exploration':
-                    current_node = self._ucb_select(current_node, c=2.5)
-                elif variation == 'Heuristic':
-                    current_node = self._ucb_select_heuristic(current_node)
-                else:
-                    print('No variation selected.')
-
-                # output the necessary messages to the screen
-                if (print_out=='Verbose'):
-                    print(f'wi: {current_node.wins}; ni: {current_node.visits}; Move selected: {current_node.move}')
+            for _, node in candidates:
+                excess -= child_count[node]
+                first_child[node] = -1
+                child_count[node] = 0
+                store.move_count[node] = 0
+                if excess <= 0:
+                    break
+
+        self._compact(self.root_index)
+        removed = before - len(self.store)
+        self.evicted += removed
+        return removed
+
+    def select(self, algorithm_type='PMCGS', variation='None', sink=None):
+        """
+        Select a node to expand based on the given algorithm.
+
+        The scratch state is left at the position of the selected node. The path taken is
+        reported to the optional trace sink.
+        """
+        self.rewind()
+        store = self.store
+        current = self.root_index
+        self.path = [current]
 
+        # the UCT variation picks the selection function and its exploration constant once per descent
+        choose = None
+        if algorithm_type == 'UCT':
+            if variation not in self.UCT_VARIATIONS:
+                raise ValueError(f"Unknown UCT variation: {variation}")
+            name, c = self.UCT_VARIATIONS[variation]
+            choose = getattr(self, name)
+
+        first_child = store.first_child
+        child_count = store.child_count
+        move_count = store.move_count
+        visits = store.visits
+        edge_child = store.edge_child
+        proven = store.proven
+        state = self.state
+        symmetry = self.symmetry
+
+        # proven nodes are only ever non-terminal with the MCTS-Solver; their result is known
+        while not proven[current]:
+            # fully expanded: every legal move has a child and every child has been visited. Only the
+            # newest child's visits are checked: children are created in edge order, and
+            # run_simulations simulates each child in the pass that creates it, so no pass can end
+            # with a child unvisited and the newest being visited means all are (see _is_fully_expanded)
+            count = child_count[current]
+            if not count or count < move_count[current] or not visits[edge_child[first_child[current] + count - 1]]:
+                break
+
+            if choose is not None:
+                edge = choose(current, c)
             else:  # Default to PMCGS
-                current_node = random.choice(current_node.children)
-                # print statements
-                if (print_out=='Verbose'):
-                    print(f'wi: {current_node.wins}; ni: {current_node.visits}; Move selected: {current_node.move}')
+                first = first_child[current]
+                edge = random.choice(range(first, first + count))
+
+            if edge is None:
+                # every move loses; only possible when the proof arrived through another parent
+                self._prove(current)
+                break
+
+            current = edge_child[edge]
+
+            # replay the move on the scratch state; the move is taken from the edge rather than
+            # the node, since a transposed node is reached by a different move from each parent
+            move = store.edge_move[edge]
+            if symmetry and is_mirrored(state.key()):
+                move = WIDTH - 1 - move  # the edge holds the column of the mirror image
+            state.make_move(move)
+            self.path.append(current)
+
+        if sink is not None:
+            moves = [entry[0] for entry in self.state.history[self.root_depth:]]
+            sink.selected(store, self.path, moves)
+
+        return Node(store, current)
+
+    def _is_fully_expanded(self, node):
+        """
+        Check if a node has children and all of them have been visited.
+
+        This takes constant time: the node's child counter is compared with its number of legal
+        moves, and only the newest child's visits are checked. Every child is simulated as soon
+        as it is created (run_simulations), so the newest child being visited means all are.
+        """
+        store = self.store
+        count = store.child_count[node]
+        if count == 0 or count < store.move_count[node]:
+            return False
+        return store.visits[store.edge_child[store.first_child[node] + count - 1]] > 0
+
+    def _backpropagation_path(self, node):
+        """Handles to update for a result at the selected node or one of its children, deepest first."""
+        if node.index == self.path[-1]:
+            return reversed(self.path)
+        return reversed(self.path + [node.index])
+
+    def backpropagate(self, node, result, sink=None):
+        """
+        Backpropagate the simulation result up the tree.
+
+        The result is passed along the path of the last selection rather than parent links, which
+        keeps the statistics consistent when a node has several parents.
+        """
+        store = self.store
+        visits = store.visits
+        wins = store.wins
+        # index of the player credited with a win, if any (-1: Red, 1: Yellow, draws credit nobody)
+        winner = 0 if result == -1 else 1 if result == 1 else -1
+
+        for index in self._backpropagation_path(node):
+            visits[index] += 1
+            if store.player[index] == winner:
+                wins[index] += 1
 
-        if (current_node.is_terminal):
-            # update terminal node value for printing purposes
-            if (current_node.player == 'R'):
-                current_node.terminal_value = -1
-            elif (current_node.player == 'Y'):
-                current_node.terminal_value = 1
-            if (print_out == 'Verbose'):
-                print(f'TERMINAL NODE VALUE: {current_node.terminal_value}')
+        if self.mcts_solver:
+            self._propagate_proof(node)
+        if sink is not None:
+            sink.backpropagated(store, self._backpropagation_path(node))
 
-        return current_node
+    def backpropagate_counts(self, node, counts, sink=None):
+        """Backpropagate the results of a batch of simulations up the tree."""
+        store = self.store
+        total = sum(counts.values())
+        won = (counts[-1], counts[1])  # wins for Red and Yellow
 
-    def backpropagate(self, node, result, print_out='None'):
-        """Backpropagate the simulation result up the tree."""
-        while node:
-            node.update(result)
+        for index in self._backpropagation_path(node):
+            store.visits[index] += total
+            store.wins[index] += won[store.player[index]]
 
-            if (print_out=='Verbose'):
-                print(f'Updated values - wi: {node.wins}; ni: {node.visits}')
+        if self.mcts_solver:
+            self._propagate_proof(node)
+        if sink is not None:
+            sink.backpropagated(store, self._backpropagation_path(node))
 
-            node = node.parent
+    def update_amaf(self, node, moves, result):
+        """
+        Update the all-moves-as-first (AMAF) statistics used by the 'RAVE' variation.
+
+        Called after a simulation from node with the rollout's moves, while the scratch state is
+        still at node. Every child of a node on the path whose move was played later in the
+        simulation by the player to move at that node counts the simulation as if its move had
+        been played first.
+        """
+        store = self.store
+        first_child = store.first_child
+        child_count = store.child_count
+        edge_move = store.edge_move
+        edge_child = store.edge_child
+        amaf_visits = store.amaf_visits
+        amaf_wins = store.amaf_wins
+        # index of the player credited with a win, if any (-1: Red, 1: Yellow, draws credit nobody)
+        winner = 0 if result == -1 else 1 if result == 1 else -1
+        path = self.path if node.index == self.path[-1] else self.path + [node.index]
+
+        # the whole simulation from the root: the moves down the tree, then the rollout
+        sequence = [entry[0] for entry in self.state.history[self.root_depth:]] + moves
+        mirrored = self._path_mirrored() if self.symmetry else None
+        for depth, index in enumerate(path):
+            count = child_count[index]
+            if not count:
+                continue
+            played = set(sequence[depth::2])  # moves of the player to move at this node
+            if mirrored is not None and mirrored[depth]:
+                played = {WIDTH - 1 - move for move in played}  # as columns of the node's orientation
+            first = first_child[index]
+            for edge in range(first, first + count):
+                if edge_move[edge] in played:
+                    child = edge_child[edge]
+                    amaf_visits[child] += 1
+                    if store.player[child] == winner:
+                        amaf_wins[child] += 1
+
+    def _propagate_proof(self, node):
+        """Prove the ancestors of a newly proven node along the selection path, as far as the proof reaches."""
+        store = self.store
+        path = self.path if node.index == self.path[-1] else self.path + [node.index]
+        if not store.proven[path[-1]]:
+            return
+        for index in reversed(path[:-1]):
+            if store.proven[index] or not self._prove(index):
+                break
+
+    def _prove(self, node):
+        """
+        Try to prove a node from its children; returns True if it is now proven.
+
+        The player to move at the node wins if any move wins for them, loses if every move
+        loses, and draws if every move is proven and none of them wins.
+        """
+        store = self.store
+        first = store.first_child[node]
+        count = store.child_count[node]
+        if first < 0 or count == 0:
+            return False
+
+        proven = store.proven
+        all_proven = True
+        drawn = False
+        for child in store.edge_child[first:first + count]:
+            status = proven[child]
+            if status == PROVEN_WIN:  # a winning move for the player to move here
+                proven[node] = PROVEN_LOSS
+                return True
+            if status == UNPROVEN:
+                all_proven = False
+            elif status == PROVEN_DRAW:
+                drawn = True
+
+        if not all_proven or count < store.move_count[node]:  # untried moves are not proven
+            return False
+        proven[node] = PROVEN_DRAW if drawn else PROVEN_WIN
+        return True
 
     def _ucb_select(self, node, c=1.4):
-        """Select a child of this node using the UCB1 formula."""
-        best_child = max(
-            node.children,
-            key=lambda child: (child.wins / child.visits) +
-                              c * math.sqrt(math.log(node.visits) / child.visits)
-        )
-        return best_child
+        """Select an edge leaving this node using the UCB1 formula; returns the edge index, or None."""
+        store = self.store
+        visits = store.visits
+        wins = store.wins
+        proven = store.proven
+        sqrt = math.sqrt
+        parent_visits = visits[node]
+        log_parent = LOG_VISITS[parent_visits] if parent_visits < LOG_CACHE_SIZE else math.log(parent_visits)
 
-    def _ucb_select_heuristic(self, node, c=1.4):
-        """Select a child of this node using the UCB1 formula with center control heuristic."""
+        # one pass over the node's contiguous block of edges; the first best edge wins ties.
+        # Moves proven to lose are skipped; returns None if every move does. For at most WIDTH
+        # children this loop is faster than handing the block to a NumPy argmax
+        first = store.first_child[node]
+        best_edge = None
+        best_value = -1.0  # every UCB value is at least 0
+        edge = first
+        for child in store.edge_child[first:first + store.child_count[node]]:
+            if proven[child] != PROVEN_LOSS:
+                child_visits = visits[child]
+                value = (wins[child] / child_visits) + c * sqrt(log_parent / child_visits)
+                if value > best_value:
+                    best_edge, best_value = edge, value
+            edge += 1
+        return best_edge
 
-        def center_control_heuristic(move):
-            """Heuristic to evaluate center control."""
-            center_columns = [2, 3, 4]  # Center columns in a 0-indexed board
-            return 1 if move in center_columns else 0  # Higher score for center moves
+    def _ucb_select_heuristic(self, node, c=1.4):
+        """Select an edge leaving this node using the UCB1 formula with center control heuristic."""
+        store = self.store
+        visits = store.visits
+        wins = store.wins
+        proven = store.proven
+        edge_move = store.edge_move
+        sqrt = math.sqrt
+        parent_visits = visits[node]
+        log_parent = LOG_VISITS[parent_visits] if parent_visits < LOG_CACHE_SIZE else math.log(parent_visits)
 
         # Select the best child using UCB1 formula adjusted by the center control heuristic
-        best_child = max(
-            node.children,
-            key=lambda child: (child.wins / child.visits if child.visits > 0 else 0) +
-                              c * math.sqrt(math.log(node.visits) / child.visits) +
-                              center_control_heuristic(child.move)  # Add heuristic score
-        )
-        return best_child
+        first = store.first_child[node]
+        best_edge = None
+        best_value = -1.0  # every value is at least 0
+        edge = first
+        for child in store.edge_child[first:first + store.child_count[node]]:
+            if proven[child] != PROVEN_LOSS:  # skip moves proven to lose
+                child_visits = visits[child]
+                value = ((wins[child] / child_visits if child_visits > 0 else 0) +
+                         c * sqrt(log_parent / child_visits) +
+                         CENTER_BONUS[edge_move[edge]])  # Add heuristic score
+                if value > best_value:
+                    best_edge, best_value = edge, value
+            edge += 1
+        return best_edge
+
+    def _path_mirrored(self):
+        """
+        Whether each position from the root down to the scratch state is the mirror image of the
+        orientation its node keeps its moves in; the scratch state is stepped back to the root and
+        forward again.
+        """
+        state = self.state
+        undone = []
+        mirrored = [is_mirrored(state.key())]
+        while len(state.history) > self.root_depth:
+            undone.append(state.history[-1][0])
+            state.undo_move()
+            mirrored.append(is_mirrored(state.key()))
+        for move in reversed(undone):
+            state.make_move(move)
+        mirrored.reverse()
+        return mirrored
+
+    def _rave_select(self, node, c=0.7):
+        """
+        Select an edge using UCB1 on a blend of each child's own win rate and its AMAF win rate (RAVE).
+
+        The AMAF weight is beta = sqrt(k / (3 N + k)) for a node with N visits and the tree's
+        rave_equivalence k; children without AMAF statistics use their own win rate alone.
+        """
+        store = self.store
+        visits = store.visits
+        wins = store.wins
+        amaf_visits = store.amaf_visits
+        amaf_wins = store.amaf_wins
+        proven = store.proven
+        sqrt = math.sqrt
+        parent_visits = visits[node]
+        log_parent = LOG_VISITS[parent_visits] if parent_visits < LOG_CACHE_SIZE else math.log(parent_visits)
+        k = self.rave_equivalence
+        beta = sqrt(k / (3 * parent_visits + k))
+
+        first = store.first_child[node]
+        best_edge = None
+        best_value = -1.0  # every value is at least 0
+        edge = first
+        for child in store.edge_child[first:first + store.child_count[node]]:
+            if proven[child] != PROVEN_LOSS:  # skip moves proven to lose
+                child_visits = visits[child]
+                rate = wins[child] / child_visits
+                if amaf_visits[child]:
+                    rate = (1 - beta) * rate + beta * amaf_wins[child] / amaf_visits[child]
+                value = rate + c * sqrt(log_parent / child_visits)
+                if value > best_value:
+                    best_edge, best_value = edge, value
+            edge += 1
+        return best_edge
 
     def best_move_uct(self):
-        """Return the child with the highest win rate (best explored move)."""
+        """Return the move of the root child with the highest win rate (best explored move)."""
+        store = self.store
+        first = store.first_child[self.root_index]
+
         # Guard against division by zero for win rate calculation
-        best_child = max(
-            (child for child in self.root.children if child.visits > 0),
-            key=lambda child: child.wins / child.visits
-        )
-        return best_child.move
+        best_move = None
+        best_rate = None
+        for edge in range(first, first + store.child_count[self.root_index]):
+            child = store.edge_child[edge]
+            if store.visits[child] > 0:
+                rate = store.wins[child] / store.visits[child]
+                if best_rate is None or rate > best_rate:
+                    best_move, best_rate = store.edge_move[edge], rate
+
+        if best_move is None:
+            raise ValueError('No visited children at the root.')
+        return WIDTH - 1 - best_move if self.root_mirrored else best_move
+
+    def advance(self, move):
+        """
+        Move the root to the position reached by a move, discarding the sibling subtrees.
+
+        Statistics already gathered under the move are kept; if the move was never expanded
+        the search starts over from a fresh root.
+        """
+        self.rewind()
+        store = self.store
+        root = self.root_index
+        player = PLAYERS.index(self.state.current_player)
+
+        # the root's edges hold columns of its canonical orientation; a root that is its own mirror
+        # image only has edges for the centre and the columns left of it
+        edge_move = WIDTH - 1 - move if self.root_mirrored else move
+        if self.symmetry and edge_move > WIDTH // 2 and is_symmetric(self.state.key()):
+            edge_move = WIDTH - 1 - edge_move
+        new_root = None
+        first = store.first_child[root]
+        if first >= 0:
+            for edge in range(first, first + store.child_count[root]):
+                if store.edge_move[edge] == edge_move:
+                    new_root = store.edge_child[edge]
+
+        self.state.make_move(move)
+        if new_root is None:
+            new_root = store.add_node(edge_move, root, player, self.state.game_over, terminal_status(self.state))
+
+        self.root_depth = len(self.state.history)
+        self.root_mirrored = self.symmetry and is_mirrored(self.state.key())
+        self._compact(new_root)
 
     def reset_root(self, new_root):
-        """Reset the root of the tree to a new root node."""
-        self.root = new_root
+        """Reset the root of the tree to a new root node below the current root."""
+        self.rewind()
+        store = self.store
+
+        # replay the moves from the old root down to the new one on the scratch state
+        moves = []
+        index = new_root.index
+        while index != self.root_index:
+            moves.append(store.move[index])
+            index = store.parent[index]
+        for move in reversed(moves):
+            if self.symmetry and is_mirrored(self.state.key()):
+                move = WIDTH - 1 - move
+            self.state.make_move(move)
+
+        self.root_depth = len(self.state.history)
+        self.root_mirrored = self.symmetry and is_mirrored(self.state.key())
+        self._compact(new_root.index)
+
+    def _compact(self, new_root):
+        """
+        Make new_root the root, copying the nodes reachable from it into a fresh store.
+
+        The rest of the old store is dropped, which frees the discarded subtrees; handles in
+        the transposition table are remapped to the new store.
+        """
+        old = self.store
+        store = NodeStore()
+        mapping = {new_root: store.copy_node(old, new_root, -1, -1)}
+
+        # breadth-first copy; each node's edges are copied as one block so children stay contiguous
+        queue = deque([new_root])
+        while queue:
+            index = queue.popleft()
+            first = old.first_child[index]
+            if first < 0:
+                continue
+
+            store.first_child[mapping[index]] = len(store.edge_move)
+            store.child_count[mapping[index]] = old.child_count[index]
+            store.move_count[mapping[index]] = old.move_count[index]
+            for edge in range(first, first + old.child_count[index]):
+                child = old.edge_child[edge]
+                if child not in mapping:
+                    mapping[child] = store.copy_node(old, child, old.edge_move[edge], mapping[index])
+                    queue.append(child)
+                store.edge_move.append(old.edge_move[edge])
+                store.edge_child.append(mapping[child])
+            # untried moves keep their reserved edges
+            untried = range(first + old.child_count[index], first + old.move_count[index])
+            store.edge_move.extend(old.edge_move[edge] for edge in untried)
+            store.edge_child.extend(-1 for _ in untried)
+
+        self.store = store
+        self.root_index = mapping[new_root]
+        self.path = [self.root_index]
+        # a search stops at a proven root, so a proven root whose children are gone is unproven
+        # again; the search expands it and proves it anew rather than having no move to choose
+        root = self.root_index
+        if store.proven[root] and not store.terminal[root] and store.first_child[root] < 0:
+            store.proven[root] = UNPROVEN
+
+        if self.table is not None:
+            # drop the positions that can no longer be reached from the new root
+            self.table = {key: mapping[node] for key, node in self.table.items() if node in mapping}
+            self.table[self._key()] = self.root_index
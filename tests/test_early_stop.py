@@ -0,0 +1,29 @@
+import connect_four as c4
+from algorithms import root_settled
+from node import Node
+from tree import Tree
+
+
+def root_with_statistics(statistics):
+    """A tree whose root has one child per (wins, visits) pair, on a position where every column is legal."""
+    game = c4.new_game('bitboard')
+    tree = Tree(game)
+    root = Node(tree.store, tree.root_index)
+    root.expand_node(tree.state)
+    store = tree.store
+    for child, (wins, visits) in zip(store.edge_child[store.first_child[tree.root_index]:], statistics):
+        store.wins[child] = wins
+        store.visits[child] = visits
+    return tree
+
+
+def test_margin_waits_while_another_move_can_overtake_the_win_rate():
+    # the best move has a larger lead in visits than the budget left, but 4/10 can still reach 84/90
+    tree = root_with_statistics([(50, 100), (4, 10)] + [(1, 10)] * 5)
+    assert not root_settled(tree, 'margin', remaining=80)
+
+
+def test_margin_stops_once_no_move_can_overtake():
+    tree = root_with_statistics([(50, 100), (4, 10)] + [(1, 10)] * 5)
+    assert root_settled(tree, 'margin', remaining=1)
+    assert not root_settled(tree, 'margin', remaining=None)
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+import connect_four as c4
+
+
+def assert_same(game, bitboard_game):
+    assert game.board == bitboard_game.board
+    assert game.current_player == bitboard_game.current_player
+    assert (game.game_over, game.winner, game.draw) == (bitboard_game.game_over, bitboard_game.winner,
+                                                        bitboard_game.draw)
+    assert game.key() == bitboard_game.key()
+    assert game.canonical_key() == bitboard_game.canonical_key()
+    assert game.to_bitboards() == bitboard_game.to_bitboards()
+    # once the game is over the list engine stops updating its valid moves
+    if not game.game_over:
+        assert list(game.valid_moves) == list(bitboard_game.valid_moves)
+        for piece in ('R', 'Y'):
+            assert game.winning_moves(piece) == bitboard_game.winning_moves(piece)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_games_match(seed):
+    rng = random.Random(seed)
+    game = c4.new_game('list')
+    bitboard_game = c4.new_game('bitboard')
+    moves = []
+    while not game.game_over:
+        move = rng.choice(list(game.valid_moves))
+        moves.append(move)
+        game.make_move(move)
+        bitboard_game.make_move(move)
+        assert_same(game, bitboard_game)
+
+    # taking the moves back retraces the same positions
+    while moves:
+        moves.pop()
+        game.undo_move()
+        bitboard_game.undo_move()
+        assert_same(game, bitboard_game)
+
+
+def test_loaded_boards_match():
+    rng = random.Random(0)
+    for _ in range(20):
+        game = c4.new_game('list')
+        for _ in range(rng.randrange(30)):
+            if game.game_over:
+                break
+            game.make_move(rng.choice(list(game.valid_moves)))
+        if game.game_over:
+            continue
+        board = [row[:] for row in game.board]
+
+        loaded = c4.new_game('list')
+        bitboard_loaded = c4.new_game('bitboard')
+        loaded.load_board(board, game.current_player)
+        bitboard_loaded.load_board(board, game.current_player)
+        assert_same(loaded, bitboard_loaded)
+        assert loaded.key() == game.key()
@@ -0,0 +1,50 @@
+import os
+
+from game_records import GameWriter, GameRecords
+from selfplay import generate_games
+
+ROSTER = [('UCT', 'None', 50), ('UR', 'None', 0)]
+GAMES = [([3, 3, 4, 4, 5, 5, 6], -1, 0, 1, 11), ([0, 1, 2, 3], None, 1, 0, 22), ([6] * 3 + [5] * 3, 1, 0, 1, 33)]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'games.c4gr')
+    with GameWriter(path, ROSTER) as writer:
+        for moves, result, red, yellow, seed in GAMES:
+            writer.write(moves, result, red, yellow, seed)
+    with GameRecords(path) as records:
+        assert records.roster == [list(agent) for agent in ROSTER]
+        assert [(record.moves, record.result, record.red, record.yellow, record.seed) for record in records] == GAMES
+        assert len(records) == len(GAMES)
+
+
+def test_append_after_truncated_record(tmp_path):
+    path = str(tmp_path / 'games.c4gr')
+    with GameWriter(path, ROSTER) as writer:
+        for moves, result, red, yellow, seed in GAMES[:2]:
+            writer.write(moves, result, red, yellow, seed)
+    # an interrupted writer leaves part of the last record behind
+    with open(path, 'r+b') as file:
+        file.truncate(os.path.getsize(path) - 2)
+
+    with GameWriter(path, ROSTER, append=True) as writer:
+        for moves, result, red, yellow, seed in GAMES:
+            writer.write(moves, result, red, yellow, seed)
+    with GameRecords(path) as records:
+        decoded = [(record.moves, record.result, record.red, record.yellow, record.seed) for record in records]
+    assert decoded == GAMES[:1] + GAMES
+
+
+def test_appended_games_continue_the_numbering(tmp_path):
+    roster = [('UR', 'None', 0)]
+    appended = str(tmp_path / 'appended.c4gr')
+    generate_games(appended, roster, 3, seed=5)
+    generate_games(appended, roster, 3, seed=5, append=True)
+    whole = str(tmp_path / 'whole.c4gr')
+    generate_games(whole, roster, 6, seed=5)
+
+    with GameRecords(appended) as records:
+        games = [(record.moves, record.seed) for record in records]
+    with GameRecords(whole) as records:
+        assert games == [(record.moves, record.seed) for record in records]
+    assert len({seed for _, seed in games}) == 6
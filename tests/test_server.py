@@ -0,0 +1,36 @@
+import threading
+from multiprocessing import Pipe
+
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def keep_sigint(monkeypatch):
+    # serve_searches ignores Ctrl-C, which is only meant for worker processes
+    monkeypatch.setattr(server.signal, 'signal', lambda signum, handler: None)
+
+
+def test_worker_answers_a_failed_search(monkeypatch):
+    def fail(job, sessions, stop, engine, options):
+        raise RuntimeError('search failed')
+
+    monkeypatch.setattr(server, 'run_search', fail)
+    conn, worker_conn = Pipe()
+    conn.send({'op': 'search', 'moves': [3]})
+    conn.send(None)
+    server.serve_searches(worker_conn, threading.Event(), 'bitboard', 8, {})
+
+    assert conn.recv() == {'error': 'search failed', 'cached': []}
+
+
+def test_worker_keeps_searching_after_an_error():
+    conn, worker_conn = Pipe()
+    conn.send({'op': 'search', 'moves': [3], 'simulations': 20, 'variation': 'Unknown'})
+    conn.send({'op': 'search', 'moves': [3], 'simulations': 20})
+    conn.send(None)
+    server.serve_searches(worker_conn, threading.Event(), 'bitboard', 8, {})
+
+    assert 'error' in conn.recv()
+    assert conn.recv()['move'] in range(7)
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+import connect_four as c4
+from solver import CELLS, Solver, empty_cells
+
+
+def endgame(seed, empty):
+    """A random position with the given number of empty cells whose game is not over yet."""
+    rng = random.Random(seed)
+    while True:
+        game = c4.new_game('bitboard')
+        while not game.game_over and empty_cells(game) > empty:
+            game.make_move(rng.choice(list(game.valid_moves)))
+        if not game.game_over:
+            return game
+
+
+def minimax_scores(game):
+    """Score of every legal move by plain minimax, on the solver's scale."""
+    played = CELLS - empty_cells(game)
+    scores = {}
+    for col in list(game.valid_moves):
+        game.make_move(col)
+        if game.winner is not None:
+            scores[col] = (CELLS + 1 - played) // 2
+        elif game.draw:
+            scores[col] = 0
+        else:
+            scores[col] = -max(minimax_scores(game).values())
+        game.undo_move()
+    return scores
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_solver_agrees_with_minimax(seed):
+    game = endgame(seed, 12)
+    expected = minimax_scores(game)
+    assert Solver().analyze(game) == expected
+    assert Solver().solve(game) == max(expected.values())
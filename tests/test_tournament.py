@@ -0,0 +1,33 @@
+import json
+
+from tournament import Tournament
+
+
+def make_tournament():
+    return Tournament([('UR', 'None', 0), ('UR', 'None', 0)], 2, seed=1)
+
+
+def test_resume_after_interruption_before_first_game(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    tournament = make_tournament()
+    path.write_text(json.dumps(tournament.header()) + '\n')  # interrupted before any game finished
+
+    tournament.run(results_path=str(path))
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0] == tournament.header()
+    assert sum('roster' in line for line in lines) == 1
+    assert len(lines) == 1 + 2
+
+    # resuming a finished tournament plays nothing more
+    make_tournament().run(results_path=str(path))
+    assert len(path.read_text().splitlines()) == 3
+
+
+def test_resume_skips_repeated_header(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    tournament = make_tournament()
+    header = json.dumps(tournament.header())
+    path.write_text(header + '\n' + header + '\n')  # left by an older interrupted run
+
+    tournament.run(results_path=str(path))
+    assert sum(1 for line in path.read_text().splitlines() if 'pairing' in line) == 2
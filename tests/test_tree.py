@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+import connect_four as c4
+from algorithms import run_simulations, root_statistics
+from node import Node
+from tournament import Game
+from tree import Tree
+
+
+@pytest.mark.parametrize('move', range(7))
+def test_advance_keeps_subtree_from_symmetric_root(move):
+    random.seed(0)
+    tree = Tree(c4.new_game('bitboard'), mcts_solver=True, symmetry=True)
+    run_simulations(tree, 300, algorithm_type='UCT')
+    mirrored = min(move, 6 - move)  # only the centre and the columns left of it have children
+    visits = dict(zip(tree.root.child_moves, (child.visits for child in tree.root.children)))[mirrored]
+
+    tree.advance(move)
+    assert tree.root.visits == visits > 0
+
+    # the search goes on from the reply's position with legal moves of that position
+    game = c4.new_game('bitboard')
+    game.make_move(move)
+    run_simulations(tree, 100, algorithm_type='UCT')
+    assert set(root_statistics(tree)) <= set(game.valid_moves)
+
+
+def test_evicting_solver_sessions_finish_their_games():
+    # proven subtrees kept across moves used to be evicted, leaving a proven root with no move
+    random.seed(1)
+    options = {'mcts_solver': True, 'node_budget': 80}
+    game = Game('UCT', 'None', 100, 'UCT', 'None', 100, 1, engine='bitboard',
+                agent1_options=options, agent2_options=options)
+    for _ in range(4):
+        game.play()
+        assert game.result is not None
+
+
+def expand_line(tree, moves):
+    """Expands the nodes along moves from the root; returns the handles of the line, root first."""
+    store = tree.store
+    line = [tree.root_index]
+    for move in moves:
+        node = line[-1]
+        if store.first_child[node] < 0:
+            Node(store, node).expand_node(tree.state, table=tree.table)
+        first = store.first_child[node]
+        edges = range(first, first + store.child_count[node])
+        line.append(next(store.edge_child[edge] for edge in edges if store.edge_move[edge] == move))
+        tree.state.make_move(move)
+    tree.rewind()
+    return line
+
+
+def test_transpositions_share_a_node_and_backpropagate_along_the_path():
+    tree = Tree(c4.new_game('bitboard'), transpositions=True)
+    first = expand_line(tree, [0, 1, 2])
+    second = expand_line(tree, [2, 1, 0])
+    assert first[-1] == second[-1]  # both move orders reach one node
+    assert len(set(first[1:-1] + second[1:-1])) == 4
+
+    # a result reached through the second parent updates that line, not the first parent's
+    tree.path = second
+    tree.backpropagate(Node(tree.store, second[-1]), -1)
+    assert [tree.store.visits[node] for node in second] == [1, 1, 1, 1]
+    assert [tree.store.visits[node] for node in first[1:-1]] == [0, 0]
+    assert tree.store.wins[second[-1]] == 1  # Red moved into it and won
+
+
+@pytest.mark.parametrize('on_full', ['evict', 'freeze'])
+def test_node_budget_bounds_the_tree(on_full):
+    random.seed(0)
+    tree = Tree(c4.new_game('bitboard'), node_budget=200, on_full=on_full)
+    run_simulations(tree, 2000, algorithm_type='UCT', expansion='single')
+    # the search runs its full budget of simulations past the node budget
+    assert tree.root.visits == 2000
+    assert len(tree.store) <= 200 + 7  # one expansion may overshoot before the next check
+    assert (tree.evicted > 0) == (on_full == 'evict')
+
+
+def test_byte_budget_bounds_the_tree():
+    random.seed(0)
+    tree = Tree(c4.new_game('bitboard'), transpositions=True, byte_budget=8000)
+    run_simulations(tree, 2000, algorithm_type='UCT', expansion='single')
+    assert tree.evicted > 0
+    assert tree.nbytes() <= 8000
+    # evicted nodes leave the transposition table with them
+    assert all(node < len(tree.store) for node in tree.table.values())
+
+
+def test_amaf_credits_the_moves_of_the_player_to_move():
+    tree = Tree(c4.new_game('bitboard'))
+    tree.store.track_amaf()
+    root, _ = expand_line(tree, [3])
+    child = expand_line(tree, [3, 0])[1]
+    store = tree.store
+
+    def amaf(node):
+        first = store.first_child[node]
+        edges = range(first, first + store.child_count[node])
+        return {store.edge_move[edge]: (store.amaf_wins[store.edge_child[edge]],
+                                        store.amaf_visits[store.edge_child[edge]]) for edge in edges}
+
+    # a simulation through the child: Red played 3 and 4, Yellow 0 and 1, and Yellow won
+    tree.path = [root, child]
+    tree.state.make_move(3)
+    tree.update_amaf(Node(store, child), [0, 4, 1], 1)
+    tree.rewind()
+
+    assert amaf(root) == {0: (0, 0), 1: (0, 0), 2: (0, 0), 3: (0, 1), 4: (0, 1), 5: (0, 0), 6: (0, 0)}
+    assert amaf(child) == {0: (1, 1), 1: (1, 1), 2: (0, 0), 3: (0, 0), 4: (0, 0), 5: (0, 0), 6: (0, 0)}
+
+
+def test_rave_search_allocates_amaf_statistics():
+    random.seed(0)
+    tree = Tree(c4.new_game('bitboard'))
+    run_simulations(tree, 200, algorithm_type='UCT')
+    assert tree.store.amaf_visits is None  # plain UCT does not pay for them
+
+    run_simulations(tree, 200, algorithm_type='UCT', variation='RAVE')
+    assert len(tree.store.amaf_visits) == len(tree.store)
+    assert sum(tree.store.amaf_visits[child.index] for child in tree.root.children) > 0